@@ -5,185 +5,218 @@ Production-grade survey analysis tool with Gemini-powered insights
 
 import sys
 import os
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import version, PackageNotFoundError
 
 # Fix Windows console encoding for emojis
 if sys.platform == 'win32':
-    import codecs
-    sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
-    sys.stderr = codecs.getwriter('utf-8')(sys.stderr.buffer, 'strict')
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
 
-from survey_analyzer import SurveyAnalyzer
-from survey_analyzer.config import Config
+try:
+    from survey_analyzer import SurveyAnalyzer
+    from survey_analyzer.config import Config
+except ImportError as e:
+    print(f"❌ Missing package: {e.name or e}")
+    print("   Run: pip install -r requirements.txt")
+    sys.exit(1)
+
+# Console output for the CLI goes through the package logger
+logger = logging.getLogger("survey_analyzer")
+
+
+def setup_logging():
+    """Send package log messages to stdout as plain lines"""
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
 
 
 def check_packages():
     """Check if required packages are installed"""
-    print("🔍 Checking required packages...")
+    logger.info("🔍 Checking required packages...")
     all_ok = True
     
-    try:
-        import pandas as pd
-        print(f"   ✅ pandas: {pd.__version__}")
-    except ImportError:
-        print("   ❌ pandas: NOT INSTALLED")
-        all_ok = False
-    
-    try:
-        import numpy as np
-        print(f"   ✅ numpy: {np.__version__}")
-    except ImportError:
-        print("   ❌ numpy: NOT INSTALLED")
-        all_ok = False
-    
-    try:
-        import matplotlib
-        print(f"   ✅ matplotlib: {matplotlib.__version__}")
-    except ImportError:
-        print("   ❌ matplotlib: NOT INSTALLED")
-        all_ok = False
-    
-    try:
-        import seaborn as sns
-        print(f"   ✅ seaborn: {sns.__version__}")
-    except ImportError:
-        print("   ❌ seaborn: NOT INSTALLED")
-        all_ok = False
+    # Read versions from package metadata instead of importing each package
+    for package in ['pandas', 'numpy', 'matplotlib', 'seaborn']:
+        try:
+            logger.info(f"   ✅ {package}: {version(package)}")
+        except PackageNotFoundError:
+            logger.error(f"   ❌ {package}: NOT INSTALLED")
+            all_ok = False
     
     # Gemini check
-    print()
-    print("🔍 Checking Gemini...")
+    logger.info("")
+    logger.info("🔍 Checking Gemini...")
     gemini_ok = False
     try:
-        import google.generativeai
-        print(f"   ✅ google-generativeai: installed")
+        logger.info(f"   ✅ google-generativeai: {version('google-generativeai')}")
         gemini_ok = True
-    except ImportError:
-        print("   ❌ google-generativeai: NOT INSTALLED")
-        print("      Run: pip install google-generativeai")
+    except PackageNotFoundError:
+        logger.error("   ❌ google-generativeai: NOT INSTALLED")
+        logger.info("      Run: pip install google-generativeai")
     
     # API key check
     api_key = Config.get_gemini_api_key()
     if api_key:
-        print(f"   ✅ Gemini API key: set in api_key.py")
+        logger.info(f"   ✅ Gemini API key: set in api_key.py")
     else:
-        print(f"   ❌ Gemini API key: not set")
-        print(f"      Open api_key.py and paste your key")
+        logger.error(f"   ❌ Gemini API key: not set")
+        logger.info(f"      Open api_key.py and paste your key")
     
-    print()
+    logger.info("")
     return all_ok, gemini_ok and (api_key is not None)
 
 
+def gemini_ready():
+    """Quick Gemini readiness check from package metadata and the API key (imports nothing heavy)"""
+    try:
+        version('google-generativeai')
+    except PackageNotFoundError:
+        return False
+    return Config.get_gemini_api_key() is not None
+
+
+def report_gemini_not_ready():
+    """Print instructions for setting up Gemini"""
+    logger.error("❌ Gemini is not ready. Make sure:")
+    logger.info("   1. pip install google-generativeai")
+    logger.info("   2. Add your API key in api_key.py")
+
+
+def wait_for_step(label, future, describe):
+    """Wait for a pipeline step running in the background and print its status"""
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.error(f"{label} ❌ FAILED: {e}")
+        raise
+    logger.info(f"{label} ✅ DONE → {describe(result)}")
+    return result
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Survey analysis with Gemini-powered insights")
+    parser.add_argument("data_file", nargs="?", default=None,
+                        help="CSV, Excel (.xlsx/.xls) or PDF file (uses sample data if omitted)")
+    parser.add_argument("--check", action="store_true",
+                        help="Check installed packages and the Gemini API key, then exit")
+    return parser.parse_args()
+
+
 def main():
     """Main execution function"""
-    
-    print("="*75)
-    print("  SURVEY ANALYSIS TOOL - GEMINI AI-POWERED INSIGHTS")
-    print("="*75)
-    print()
-    
-    # Check packages
-    core_ok, gemini_ok = check_packages()
-    if not core_ok:
-        print("❌ Missing required packages. Run: pip install -r requirements.txt")
-        sys.exit(1)
-    
-    if not gemini_ok:
-        print("❌ Gemini is not ready. Make sure:")
-        print("   1. pip install google-generativeai")
-        print("   2. Add your API key in api_key.py")
+    args = parse_args()
+    setup_logging()
+    
+    logger.info("="*75)
+    logger.info("  SURVEY ANALYSIS TOOL - GEMINI AI-POWERED INSIGHTS")
+    logger.info("="*75)
+    logger.info("")
+    
+    # Full package check only on request - a missing package already fails the imports above
+    if args.check:
+        core_ok, gemini_ok = check_packages()
+        if not core_ok:
+            logger.error("❌ Missing required packages. Run: pip install -r requirements.txt")
+        if not gemini_ok:
+            report_gemini_not_ready()
+        sys.exit(0 if core_ok and gemini_ok else 1)
+    
+    if not gemini_ready():
+        report_gemini_not_ready()
+        logger.info("   Run: python main.py --check for details")
         sys.exit(1)
     
     # Check if a file path was passed as argument
-    data_source = None
-    if len(sys.argv) > 1:
-        data_source = sys.argv[1]
+    data_source = args.data_file
+    if data_source is not None:
         if not os.path.exists(data_source):
-            print(f"❌ File not found: {data_source}")
+            logger.error(f"❌ File not found: {data_source}")
             sys.exit(1)
-        print(f"📂 Data source: {data_source}")
+        logger.info(f"📂 Data source: {data_source}")
     else:
-        print("📂 Data source: Sample data (pass a file path to use your own)")
-        print("   Usage: python main.py your_data.csv")
-        print("   Supported: .csv, .xlsx, .xls, .pdf")
+        logger.info("📂 Data source: Sample data (pass a file path to use your own)")
+        logger.info("   Usage: python main.py your_data.csv")
+        logger.info("   Supported: .csv, .xlsx, .xls, .pdf")
     
     # Initialize analyzer
-    print()
-    print("🚀 Starting Analysis...")
-    print()
+    logger.info("")
+    logger.info("🚀 Starting Analysis...")
+    logger.info("")
     
-    analyzer = SurveyAnalyzer(data=data_source)
+    try:
+        analyzer = SurveyAnalyzer(data=data_source)
+    except RuntimeError as e:
+        # Gemini could not be set up - the message already carries the instructions
+        logger.error(str(e).strip())
+        sys.exit(1)
     
     # Run analysis steps
-    print("📊 Step 1/5: Calculating statistics...", end=" ")
     try:
         analyzer.calculate_statistics()
-        print("✅ DONE")
-    except Exception as e:
-        print(f"❌ FAILED: {e}")
-        raise
-    
-    print("🎨 Step 2/5: Creating visualizations...", end=" ")
-    try:
-        viz_path = analyzer.create_visualizations()
-        print(f"✅ DONE → {os.path.basename(viz_path)}")
-    except Exception as e:
-        print(f"❌ FAILED: {e}")
-        raise
-    
-    print("📝 Step 3/5: Generating AI report (Gemini)...", end=" ")
-    try:
-        report = analyzer.generate_report()
-        report_path = os.path.join(analyzer.output_dir, "survey_report.txt")
-        print(f"✅ DONE → {os.path.basename(report_path)}")
-    except Exception as e:
-        print(f"❌ FAILED: {e}")
-        raise
-    
-    print("💾 Step 4/5: Exporting data files...", end=" ")
-    try:
-        exported_files = analyzer.export_data()
-        print(f"✅ DONE → {len(exported_files)} files exported")
-    except Exception as e:
-        print(f"❌ FAILED: {e}")
-        raise
-    
-    print("🤖 Step 5/5: Generating output explanation (Gemini)...", end=" ")
-    try:
-        explanation_file = analyzer.generate_output_explanation(exported_files)
-        print(f"✅ DONE → {os.path.basename(explanation_file)}")
     except Exception as e:
-        print(f"❌ FAILED: {e}")
+        logger.error(f"📊 Step 1/5: Calculating statistics... ❌ FAILED: {e}")
         raise
+    logger.info("📊 Step 1/5: Calculating statistics... ✅ DONE")
+    
+    # Steps 2-5 only read the data and statistics, so they run concurrently:
+    # the Gemini calls (steps 3 and 5) overlap with chart rendering and export
+    logger.info("⚡ Running steps 2-5 in parallel...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        viz_future = executor.submit(analyzer.create_visualizations)
+        # Only the file is needed here, so skip keeping the report text in memory
+        report_future = executor.submit(analyzer.generate_report, return_text=False)
+        export_future = executor.submit(analyzer.export_data)
+        # The explanation needs the exported file list
+        explanation_future = executor.submit(
+            lambda: analyzer.generate_output_explanation(export_future.result())
+        )
+        
+        wait_for_step("🎨 Step 2/5: Creating visualizations...", viz_future,
+                      os.path.basename)
+        wait_for_step("📝 Step 3/5: Generating AI report (Gemini)...", report_future,
+                      os.path.basename)
+        wait_for_step("💾 Step 4/5: Exporting data files...", export_future,
+                      lambda files: f"{len(files)} files exported")
+        wait_for_step("🤖 Step 5/5: Generating output explanation (Gemini)...", explanation_future,
+                      os.path.basename)
     
     # Final summary
-    print("\n" + "="*75)
-    print("✅ ANALYSIS COMPLETE!")
-    print("="*75)
+    logger.info("\n" + "="*75)
+    logger.info("✅ ANALYSIS COMPLETE!")
+    logger.info("="*75)
     
     output_dir = analyzer.output_dir
     abs_output_dir = os.path.abspath(output_dir)
     folder_name = os.path.basename(output_dir)
     
-    print(f"\n📁 OUTPUT FOLDER: {folder_name}")
-    print(f"📁 FULL PATH: {abs_output_dir}")
-    print()
-    print(f"🤖 LLM: {analyzer.llm_provider.name}")
-    print("   All insights and explanations are generated by Gemini AI")
-    print()
-    print("📄 Generated Files:")
-    print(f"   • survey_report.txt          - Full analysis report")
-    print("                                └─ 🤖 AI insights by Gemini")
-    print(f"   • output_explanation.txt     - AI explanation of all outputs")
-    print("                                └─ 🤖 Fully written by Gemini")
-    print(f"   • survey_visualizations.png  - Visual dashboard (8 charts)")
-    print(f"   • age_group_analysis.csv     - Age demographics")
-    print(f"   • regional_analysis.csv      - Regional breakdown")
-    print(f"   • survey_raw_data.csv        - Complete dataset")
-    print(f"   • statistics.json            - Calculated metrics")
-    print()
-    print("💡 Each run creates a NEW timestamped folder.")
-    print(f"💡 Open: {abs_output_dir}")
-    print()
+    logger.info(f"\n📁 OUTPUT FOLDER: {folder_name}")
+    logger.info(f"📁 FULL PATH: {abs_output_dir}")
+    logger.info("")
+    logger.info(f"🤖 LLM: {analyzer.llm_provider.name}")
+    logger.info("   All insights and explanations are generated by Gemini AI")
+    logger.info("")
+    logger.info("📄 Generated Files:")
+    logger.info(f"   • survey_report.txt          - Full analysis report")
+    logger.info("                                └─ 🤖 AI insights by Gemini")
+    logger.info(f"   • output_explanation.txt     - AI explanation of all outputs")
+    logger.info("                                └─ 🤖 Fully written by Gemini")
+    logger.info(f"   • survey_visualizations.png  - Visual dashboard (8 charts)")
+    logger.info(f"   • age_group_analysis.csv     - Age demographics")
+    logger.info(f"   • regional_analysis.csv      - Regional breakdown")
+    logger.info(f"   • survey_raw_data.csv        - Complete dataset")
+    logger.info(f"   • statistics.json            - Calculated metrics")
+    logger.info("")
+    logger.info("💡 Each run creates a NEW timestamped folder.")
+    logger.info(f"💡 Open: {abs_output_dir}")
+    logger.info("")
     
     return analyzer
 
@@ -192,10 +225,10 @@ if __name__ == "__main__":
     try:
         analyzer = main()
     except KeyboardInterrupt:
-        print("\n\n⚠️  Analysis interrupted by user")
+        logger.warning("\n\n⚠️  Analysis interrupted by user")
         sys.exit(1)
     except Exception as e:
-        print(f"\n\n❌ Error: {e}")
+        logger.error(f"\n\n❌ Error: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
@@ -3,36 +3,143 @@ Main Survey Analyzer class
 Orchestrates all analysis components
 """
 
+import logging
 import os
 import json
+import inspect
+import shutil
+import threading
 import pandas as pd
 from datetime import datetime
+from pathlib import Path
 from typing import Optional, Union, Dict
 
-from .data_loader import DataLoader
+from .data_loader import DataLoader, PYARROW_AVAILABLE
 from .llm_providers import BaseLLMProvider, get_llm_provider
-from .statistics import StatisticsCalculator
+from .statistics import calculate_comprehensive_stats, segment_means, analyze_by_segment, get_sentiment_analysis
 from .visualizations import VisualizationGenerator
 from .report_generator import ReportGenerator
 from .config import Config
 
+logger = logging.getLogger(__name__)
+
+
+# orjson is optional - a faster JSON encoder with native numpy support
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Output explanation prompt - filled from the statistics dict, so identical
+# stats give an identical prompt (and a hit in the Gemini response cache)
+_EXPLANATION_TEMPLATE = """You are an expert business analyst explaining survey analysis results to a business stakeholder. 
+
+SURVEY OVERVIEW:
+- Total Responses: {total_responses}
+- Average Satisfaction: {avg_satisfaction:.2f}/5.0
+- Net Promoter Score: {nps_score:.2f}
+- Best Region: {best_region} ({best_region_score:.2f}/5.0)
+- Top Age Group: {top_age_group} ({top_age_score:.2f}/5.0)
+
+OUTPUT FILES GENERATED:
+1. survey_report.txt - Comprehensive analysis report with AI-generated insights
+2. survey_visualizations.png - Dashboard with 8 charts (histograms, bar charts, pie charts, line charts, heatmap)
+3. age_group_analysis.csv - Demographic breakdown by age group with mean, std dev, and counts
+4. regional_analysis.csv - Geographic performance analysis by region
+5. survey_raw_data.csv - Complete dataset with all survey responses
+6. statistics.json - All calculated metrics in JSON format
+
+CHART DETAILS (from survey_visualizations.png):
+- Chart 1: Overall Satisfaction Distribution (histogram showing score frequencies 1-5)
+- Chart 2: Average Scores by Metric (horizontal bar chart: Satisfaction, Quality, Service, Value)
+- Chart 3: NPS Distribution (pie chart: Promoters, Passives, Detractors)
+- Chart 4: Satisfaction by Region (horizontal bar chart showing regional averages)
+- Chart 5: Metrics by Age Group (grouped bar chart: Satisfaction, Quality, Service across age groups)
+- Chart 6: Likelihood to Recommend Distribution (histogram 0-10 scale)
+- Chart 7: Satisfaction Trend Over Time (line chart with weekly averages)
+- Chart 8: Metric Correlations (heatmap showing relationships between metrics)
+
+Provide a comprehensive, business-friendly explanation that:
+
+1. EXPLAIN THE REPORT (survey_report.txt):
+   - What sections it contains
+   - What insights are in each section
+   - Why this report is valuable for decision-making
+
+2. EXPLAIN THE CHARTS (survey_visualizations.png):
+   - Describe what each of the 8 charts shows
+   - Explain the key insights from each chart
+   - Connect chart findings to business implications
+   - Use simple language as if explaining to a non-technical business owner
+
+3. EXPLAIN THE DATA FILES:
+   - age_group_analysis.csv: What demographic insights it reveals
+   - regional_analysis.csv: What geographic patterns it shows
+   - survey_raw_data.csv: What's in the raw data
+   - statistics.json: What metrics are tracked
+
+4. PROVIDE EXECUTIVE SUMMARY:
+   - Overall key findings across all outputs
+   - Most important insights for business decisions
+   - Action items based on the analysis
+
+Write in clear, professional business language. Be specific about numbers and findings. 
+Format as a comprehensive document that a business stakeholder can read to understand everything."""
+
+_EXPLANATION_HEADER = """OUTPUT FILES EXPLANATION
+================================================================================
+Generated by: {provider}
+Date: {date}
+================================================================================
+
+"""
+
+_EXPLANATION_FOOTER = """
+
+================================================================================
+This explanation was generated by AI (Google Gemini) to help you understand 
+all the output files in this analysis folder.
+================================================================================
+"""
+
 
 class SurveyAnalyzer:
     """Main survey analysis engine"""
     
-    def __init__(self, data: Optional[Union[pd.DataFrame, Dict]] = None,
+    # Output file names (inside the output directory)
+    VISUALIZATION_FILE = Path("survey_visualizations.png")
+    REPORT_FILE = Path("survey_report.txt")
+    EXPLANATION_FILE = Path("output_explanation.txt")
+    AGE_GROUP_FILE = Path("age_group_analysis.csv")
+    REGION_FILE = Path("regional_analysis.csv")
+    RAW_DATA_FILE = Path("survey_raw_data.csv")
+    STATISTICS_FILE = Path("statistics.json")
+    
+    def __init__(self, data: Optional[Union[pd.DataFrame, Dict, str]] = None,
                  llm_provider: Optional[BaseLLMProvider] = None,
-                 output_dir: Optional[str] = None):
+                 output_dir: Optional[str] = None,
+                 dtype: Optional[Dict[str, str]] = None):
         """
         Initialize Survey Analyzer
         
         Args:
-            data: DataFrame, dict, or None (for sample data)
+            data: DataFrame, dict, file path, or None (for sample data)
             llm_provider: LLM provider instance (auto-detects if None)
             output_dir: Optional custom output directory (uses timestamped dir if None)
+            dtype: Optional column -> dtype map for CSV files (e.g. {'satisfaction': 'int8'})
         """
+        # Segment analysis cache (cleared whenever df is replaced)
+        self._segment_lock = threading.Lock()
+        
         # Load data
-        self.df = DataLoader.load_data(data)
+        self.df = DataLoader.load_data(data, dtype=dtype)
+        
+        # Source file, so an unchanged CSV can be copied instead of re-serialized
+        self._source_path = data if isinstance(data, str) else None
+        
+        # Sample data generated here has no gaps, so statistics can skip the missing-value scan
+        self._known_missing_cells = 0 if data is None else None
         
         # Setup output directory (timestamped by default)
         if output_dir is None:
@@ -40,44 +147,68 @@ class SurveyAnalyzer:
         else:
             self.output_dir = output_dir
             os.makedirs(self.output_dir, exist_ok=True)
+        self._out = Path(self.output_dir)
         
         # Setup LLM (Gemini)
         self.llm_provider = llm_provider or get_llm_provider()
         
         # Initialize components
-        self.stats_calc = StatisticsCalculator()
         self.visualizer = VisualizationGenerator(self.df)
         
         # Statistics cache
         self.stats = None
         
-        print(f"📊 Initialized with {len(self.df)} responses")
-        print(f"🤖 LLM Provider: {self.llm_provider.name}")
+        logger.info(f"📊 Initialized with {len(self.df)} responses")
+        logger.info(f"🤖 LLM Provider: {self.llm_provider.name}")
         
         # Show folder name clearly
-        folder_name = os.path.basename(self.output_dir)
-        abs_path = os.path.abspath(self.output_dir)
-        print(f"📁 Output Folder: {folder_name}")
-        print(f"📁 Full Path: {abs_path}")
-        print()
+        folder_name = self._out.name
+        abs_path = self._out.resolve()
+        logger.info(f"📁 Output Folder: {folder_name}")
+        logger.info(f"📁 Full Path: {abs_path}")
+        logger.info("")
+    
+    @property
+    def df(self) -> pd.DataFrame:
+        """Survey data"""
+        return self._df
+    
+    @df.setter
+    def df(self, value: pd.DataFrame):
+        self._df = value
+        self._segment_cache = {}
+        self._source_path = None
+        self._known_missing_cells = None
+        # Keep the visualizer (and its cached dashboard layout) on the new data
+        if getattr(self, 'visualizer', None) is not None:
+            self.visualizer.set_data(value)
     
     def calculate_statistics(self) -> Dict:
         """Calculate comprehensive statistics"""
-        self.stats = self.stats_calc.calculate_comprehensive_stats(self.df)
+        # Segment means are computed once and shared with the dashboard, but kept
+        # out of the exported stats
+        means = segment_means(self.df)
+        self.stats = calculate_comprehensive_stats(self.df, missing_cells=self._known_missing_cells,
+                                                   segment_means=means)
+        self.visualizer.stats = self.stats
+        self.visualizer.segment_means = means
         return self.stats
     
     def analyze_by_segment(self, segment_column: str) -> pd.DataFrame:
-        """Analyze metrics by segment"""
-        return self.stats_calc.analyze_by_segment(self.df, segment_column)
+        """Analyze metrics by segment (cached - the report and export both use it)"""
+        with self._segment_lock:
+            if segment_column not in self._segment_cache:
+                self._segment_cache[segment_column] = analyze_by_segment(self.df, segment_column)
+            return self._segment_cache[segment_column]
     
     def get_sentiment_analysis(self) -> Optional[Dict]:
         """Basic sentiment analysis of feedback"""
-        return self.stats_calc.get_sentiment_analysis(self.df)
+        return get_sentiment_analysis(self.df)
     
     def create_visualizations(self, save_path: Optional[str] = None):
         """Create comprehensive visualization dashboard"""
         if save_path is None:
-            save_path = os.path.join(self.output_dir, "survey_visualizations.png")
+            save_path = str(self._out / self.VISUALIZATION_FILE)
         self.visualizer.create_dashboard(save_path)
         return save_path
     
@@ -89,8 +220,9 @@ class SurveyAnalyzer:
         report_gen = ReportGenerator(self.df, self.stats, self.llm_provider)
         return report_gen.get_llm_insights(insight_type)
     
-    def generate_report(self, save_path: Optional[str] = None) -> str:
-        """Generate comprehensive text report"""
+    def generate_report(self, save_path: Optional[str] = None, include_dup_check: bool = True,
+                        return_text: bool = True) -> str:
+        """Generate comprehensive text report (returns its path instead when return_text is False)"""
         if self.stats is None:
             self.calculate_statistics()
         
@@ -105,39 +237,77 @@ class SurveyAnalyzer:
             region_analysis = self.analyze_by_segment('region')
         
         if save_path is None:
-            save_path = os.path.join(self.output_dir, "survey_report.txt")
+            save_path = str(self._out / self.REPORT_FILE)
         
         report_gen = ReportGenerator(self.df, self.stats, self.llm_provider)
-        return report_gen.generate_report(save_path, sentiment, age_analysis, region_analysis)
+        return report_gen.generate_report(save_path, sentiment, age_analysis, region_analysis,
+                                          include_dup_check=include_dup_check,
+                                          return_text=return_text)
     
-    def export_data(self, base_path: Optional[str] = None) -> list:
-        """Export all analysis data"""
-        base_path = base_path or self.output_dir
-        os.makedirs(base_path, exist_ok=True)
+    def export_data(self, base_path: Optional[str] = None, format: str = 'csv') -> list:
+        """
+        Export all analysis data
+        
+        Args:
+            base_path: Directory to export to (defaults to the output directory)
+            format: Raw data format - 'csv' (default) or 'parquet' (requires pyarrow)
+            
+        Returns:
+            List of exported file paths
+        """
+        if format not in ('csv', 'parquet'):
+            raise ValueError(f"Unsupported export format: {format}. Supported: csv, parquet")
+        if format == 'parquet' and not PYARROW_AVAILABLE:
+            raise ImportError(
+                "pyarrow is required for Parquet export.\n"
+                "Install it: pip install pyarrow"
+            )
+        
+        if base_path is None:
+            out = self._out  # Created in __init__
+        else:
+            out = Path(base_path)
+            out.mkdir(parents=True, exist_ok=True)
         
         exports = []
         
         if 'age_group' in self.df.columns:
-            age_file = os.path.join(base_path, 'age_group_analysis.csv')
+            age_file = str(out / self.AGE_GROUP_FILE)
             self.analyze_by_segment('age_group').to_csv(age_file)
             exports.append(age_file)
         
         if 'region' in self.df.columns:
-            region_file = os.path.join(base_path, 'regional_analysis.csv')
+            region_file = str(out / self.REGION_FILE)
             self.analyze_by_segment('region').to_csv(region_file)
             exports.append(region_file)
         
-        raw_file = os.path.join(base_path, 'survey_raw_data.csv')
-        self.df.to_csv(raw_file, index=False)
+        if format == 'parquet':
+            raw_file = str(out / self.RAW_DATA_FILE.with_suffix('.parquet'))
+            self.df.to_parquet(raw_file, engine='pyarrow', compression='zstd', index=False)
+        else:
+            raw_file = str(out / self.RAW_DATA_FILE)
+            if self._source_path and self._source_path.lower().endswith('.csv'):
+                # The data came straight from this CSV - a file copy beats a pandas round-trip
+                shutil.copyfile(self._source_path, raw_file)
+            else:
+                self.df.to_csv(raw_file, index=False)
         exports.append(raw_file)
         
         if self.stats:
-            stats_file = os.path.join(base_path, 'statistics.json')
-            with open(stats_file, 'w') as f:
-                json.dump(self.stats, f, indent=2, default=str)
+            stats_file = str(out / self.STATISTICS_FILE)
+            if orjson is not None:
+                with open(stats_file, 'wb') as f:
+                    f.write(orjson.dumps(
+                        self.stats,
+                        option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+                        default=str
+                    ))
+            else:
+                with open(stats_file, 'w') as f:
+                    json.dump(self.stats, f, indent=2, default=str)
             exports.append(stats_file)
         
-        print(f"✅ Exported {len(exports)} files to: {base_path}")
+        logger.info(f"✅ Exported {len(exports)} files to: {out}")
         return exports
     
     def generate_output_explanation(self, output_files: list) -> str:
@@ -145,81 +315,41 @@ class SurveyAnalyzer:
         if self.stats is None:
             self.calculate_statistics()
         
-        explanation_prompt = f"""You are an expert business analyst explaining survey analysis results to a business stakeholder. 
-
-SURVEY OVERVIEW:
-- Total Responses: {self.stats['total_responses']}
-- Average Satisfaction: {self.stats['avg_satisfaction']:.2f}/5.0
-- Net Promoter Score: {self.stats['nps_score']:.2f}
-- Best Region: {self.stats['best_region']} ({self.stats['best_region_score']:.2f}/5.0)
-- Top Age Group: {self.stats['top_age_group']} ({self.stats['top_age_score']:.2f}/5.0)
-
-OUTPUT FILES GENERATED:
-1. survey_report.txt - Comprehensive analysis report with AI-generated insights
-2. survey_visualizations.png - Dashboard with 8 charts (histograms, bar charts, pie charts, line charts, heatmap)
-3. age_group_analysis.csv - Demographic breakdown by age group with mean, std dev, and counts
-4. regional_analysis.csv - Geographic performance analysis by region
-5. survey_raw_data.csv - Complete dataset with all survey responses
-6. statistics.json - All calculated metrics in JSON format
-
-CHART DETAILS (from survey_visualizations.png):
-- Chart 1: Overall Satisfaction Distribution (histogram showing score frequencies 1-5)
-- Chart 2: Average Scores by Metric (horizontal bar chart: Satisfaction, Quality, Service, Value)
-- Chart 3: NPS Distribution (pie chart: Promoters, Passives, Detractors)
-- Chart 4: Satisfaction by Region (horizontal bar chart showing regional averages)
-- Chart 5: Metrics by Age Group (grouped bar chart: Satisfaction, Quality, Service across age groups)
-- Chart 6: Likelihood to Recommend Distribution (histogram 0-10 scale)
-- Chart 7: Satisfaction Trend Over Time (line chart with weekly averages)
-- Chart 8: Metric Correlations (heatmap showing relationships between metrics)
-
-Provide a comprehensive, business-friendly explanation that:
+        explanation_prompt = _EXPLANATION_TEMPLATE.format(**self.stats)
 
-1. EXPLAIN THE REPORT (survey_report.txt):
-   - What sections it contains
-   - What insights are in each section
-   - Why this report is valuable for decision-making
-
-2. EXPLAIN THE CHARTS (survey_visualizations.png):
-   - Describe what each of the 8 charts shows
-   - Explain the key insights from each chart
-   - Connect chart findings to business implications
-   - Use simple language as if explaining to a non-technical business owner
-
-3. EXPLAIN THE DATA FILES:
-   - age_group_analysis.csv: What demographic insights it reveals
-   - regional_analysis.csv: What geographic patterns it shows
-   - survey_raw_data.csv: What's in the raw data
-   - statistics.json: What metrics are tracked
-
-4. PROVIDE EXECUTIVE SUMMARY:
-   - Overall key findings across all outputs
-   - Most important insights for business decisions
-   - Action items based on the analysis
-
-Write in clear, professional business language. Be specific about numbers and findings. 
-Format as a comprehensive document that a business stakeholder can read to understand everything."""
-
-        print("🤖 Generating comprehensive output explanation from Gemini...")
-        explanation = self.llm_provider.generate(explanation_prompt)
-        
-        if not explanation:
-            explanation = "[Error: Could not generate explanation. Check your Gemini API key in api_key.py]"
-        
-        explanation_path = os.path.join(self.output_dir, "output_explanation.txt")
+        logger.info("🤖 Generating comprehensive output explanation from Gemini...")
+        explanation_path = str(self._out / self.EXPLANATION_FILE)
         with open(explanation_path, 'w', encoding='utf-8') as f:
-            f.write(f"""OUTPUT FILES EXPLANATION
-{'='*80}
-Generated by: {self.llm_provider.name}
-Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-{'='*80}
-
-{explanation}
-
-{'='*80}
-This explanation was generated by AI (Google Gemini) to help you understand 
-all the output files in this analysis folder.
-{'='*80}
-""")
+            f.write(_EXPLANATION_HEADER.format(
+                provider=self.llm_provider.name,
+                date=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            ))
+            
+            # Stream the explanation into the file as Gemini produces it
+            written = False
+            def write_chunk(text: str):
+                nonlocal written
+                f.write(text)
+                f.flush()
+                written = True
+            
+            # Custom providers written against generate(prompt) don't take a callback
+            params = inspect.signature(self.llm_provider.generate).parameters
+            if 'on_chunk' in params or any(p.kind is p.VAR_KEYWORD for p in params.values()):
+                explanation = self.llm_provider.generate(explanation_prompt, on_chunk=write_chunk)
+            else:
+                explanation = self.llm_provider.generate(explanation_prompt)
+            
+            if explanation and not written:
+                # The provider returned the text without streaming it
+                f.write(explanation)
+            elif not explanation:
+                if written:
+                    f.write("\n\n[Truncated: Gemini stopped responding before the explanation was complete]")
+                else:
+                    f.write("[Error: Could not generate explanation. Check your Gemini API key in api_key.py]")
+            
+            f.write(_EXPLANATION_FOOTER)
         
-        print(f"✅ Output explanation saved to: {explanation_path}")
+        logger.info(f"✅ Output explanation saved to: {explanation_path}")
         return explanation_path
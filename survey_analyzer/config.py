@@ -13,6 +13,9 @@ class Config:
     # Base output directory
     BASE_OUTPUT_DIR = "./outputs"
     
+    # Cache directory for Gemini responses (keyed by prompt fingerprint)
+    LLM_CACHE_DIR = "./.llm_cache"
+    
     # Gemini API Key - loaded from api_key.py file
     @staticmethod
     def get_gemini_api_key() -> Optional[str]:
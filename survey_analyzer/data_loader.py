@@ -3,63 +3,135 @@ Data loading utilities for Survey Analyzer
 Supports: CSV, Excel (.xlsx/.xls), PDF, and dummy data generation.
 """
 
+import logging
 import os
+import importlib.util
 import pandas as pd
 import numpy as np
-from typing import Dict, Optional, Union
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+# pyarrow is optional - when installed, frames use Arrow-backed dtypes
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+def _extract_page_tables(file_path: str, page_idx: int) -> List[list]:
+    """Extract tables from one PDF page (top-level so worker processes can pickle it)"""
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return pdf.pages[page_idx].extract_tables()
 
 
 class DataLoader:
     """Handles data loading and generation"""
     
+    # Low-cardinality text columns stored as pandas categoricals
+    CATEGORICAL_COLUMNS = ['age_group', 'gender', 'region', 'purchase_frequency', 'feedback']
+    
+    # Integer score columns (1-5 and 0-10 scales) that fit in int8
+    SCORE_COLUMNS = ['satisfaction', 'product_quality', 'customer_service',
+                     'value_for_money', 'likelihood_to_recommend']
+    
     @staticmethod
-    def generate_sample_data(n_responses: int = 150) -> Dict:
+    def generate_sample_data(n_responses: int = 150, columns: Optional[List[str]] = None) -> Dict:
         """
         Generate sample survey data for testing
         
+        Columns are built on demand, so asking for a subset (e.g. for large
+        scaling tests) only allocates those columns. Each column draws from
+        its own seeded stream, so values do not depend on which columns are requested.
+        
         Args:
             n_responses: Number of survey responses to generate
+            columns: Optional list of columns to generate (default: all)
             
         Returns:
             Dictionary with survey data
         """
-        np.random.seed(42)  # For reproducibility
-        
-        feedback_options = [
+        age_groups = np.array(['18-25', '26-35', '36-45', '46-55', '55+'])
+        genders = np.array(['Male', 'Female', 'Non-binary', 'Prefer not to say'])
+        regions = np.array(['North', 'South', 'East', 'West', 'Central'])
+        purchase_frequencies = np.array(['First time', 'Occasional', 'Regular', 'Frequent'])
+        feedback_options = np.array([
             'Excellent product quality!', 'Very satisfied with service', 'Could be better', 
             'Great experience overall', 'Amazing customer support', 'Product needs improvement',
             'Fantastic value!', 'Good but not great', 'Average experience', 'Highly recommend!',
             'Outstanding quality', 'Service was quick', 'Price is too high', 'Love the product',
             'Will buy again', 'Not satisfied', 'Perfect solution', 'Exceeded expectations',
             'Decent product', 'Could improve delivery'
+        ])
+        
+        # Weighted score columns: (probabilities, lowest score on the scale)
+        score_specs = [
+            ([0.05, 0.10, 0.25, 0.35, 0.25], 1),   # satisfaction
+            ([0.03, 0.07, 0.20, 0.40, 0.30], 1),   # product_quality
+            ([0.05, 0.15, 0.25, 0.30, 0.25], 1),   # customer_service
+            ([0.08, 0.12, 0.30, 0.30, 0.20], 1),   # value_for_money
+            ([0.02, 0.03, 0.05, 0.05, 0.08, 0.10, 0.12, 0.15, 0.15, 0.15, 0.10], 0),   # likelihood_to_recommend
         ]
         
-        return {
-            'timestamp': pd.date_range('2024-01-01', periods=n_responses, freq='D'),
-            'respondent_id': [f'R{str(i).zfill(4)}' for i in range(1, n_responses + 1)],
-            'age_group': np.random.choice(['18-25', '26-35', '36-45', '46-55', '55+'], n_responses),
-            'gender': np.random.choice(['Male', 'Female', 'Non-binary', 'Prefer not to say'], n_responses),
-            'satisfaction': np.random.choice([1, 2, 3, 4, 5], n_responses, p=[0.05, 0.10, 0.25, 0.35, 0.25]),
-            'product_quality': np.random.choice([1, 2, 3, 4, 5], n_responses, p=[0.03, 0.07, 0.20, 0.40, 0.30]),
-            'customer_service': np.random.choice([1, 2, 3, 4, 5], n_responses, p=[0.05, 0.15, 0.25, 0.30, 0.25]),
-            'value_for_money': np.random.choice([1, 2, 3, 4, 5], n_responses, p=[0.08, 0.12, 0.30, 0.30, 0.20]),
-            'likelihood_to_recommend': np.random.choice(range(0, 11), n_responses, p=[0.02, 0.03, 0.05, 0.05, 0.08, 0.10, 0.12, 0.15, 0.15, 0.15, 0.10]),
-            'feedback': np.random.choice(feedback_options, n_responses),
-            'region': np.random.choice(['North', 'South', 'East', 'West', 'Central'], n_responses),
-            'purchase_frequency': np.random.choice(['First time', 'Occasional', 'Regular', 'Frequent'], n_responses)
+        # Independent reproducible streams: one per categorical column, one for the score block
+        seeds = np.random.SeedSequence(42).spawn(6)
+        rngs = [np.random.default_rng(seed) for seed in seeds]
+        
+        # Draw integer indices and gather, rather than sampling the string arrays directly
+        def pick(rng: np.random.Generator, options: np.ndarray) -> np.ndarray:
+            return options[rng.integers(0, len(options), n_responses)]
+        
+        score_cache = {}
+        
+        def scores() -> np.ndarray:
+            # One uniform draw for all score columns, mapped through each column's CDF
+            if 'block' not in score_cache:
+                u = rngs[5].random((len(score_specs), n_responses))
+                block = np.empty((len(score_specs), n_responses), dtype=np.int8)
+                for i, (p, low) in enumerate(score_specs):
+                    cdf = np.cumsum(p)
+                    cdf[-1] = 1.0  # Guard against rounding leaving the top bucket unreachable
+                    block[i] = np.searchsorted(cdf, u[i], side='right') + low
+                score_cache['block'] = block
+            return score_cache['block']
+        
+        builders = {
+            'timestamp': lambda: pd.date_range('2024-01-01', periods=n_responses, freq='D'),
+            'respondent_id': lambda: np.char.add('R', np.char.zfill(np.arange(1, n_responses + 1).astype(str), 4)),
+            'age_group': lambda: pick(rngs[0], age_groups),
+            'gender': lambda: pick(rngs[1], genders),
+            'satisfaction': lambda: scores()[0],
+            'product_quality': lambda: scores()[1],
+            'customer_service': lambda: scores()[2],
+            'value_for_money': lambda: scores()[3],
+            'likelihood_to_recommend': lambda: scores()[4],
+            'feedback': lambda: pick(rngs[2], feedback_options),
+            'region': lambda: pick(rngs[3], regions),
+            'purchase_frequency': lambda: pick(rngs[4], purchase_frequencies)
         }
+        
+        if columns is None:
+            columns = list(builders)
+        unknown = [col for col in columns if col not in builders]
+        if unknown:
+            raise ValueError(f"Unknown sample columns: {', '.join(unknown)}. Available: {', '.join(builders)}")
+        
+        return {col: builders[col]() for col in columns}
     
     @staticmethod
-    def load_data(data: Optional[Union[pd.DataFrame, Dict, str]] = None) -> pd.DataFrame:
+    def load_data(data: Optional[Union[pd.DataFrame, Dict, str]] = None,
+                  dtype: Optional[Dict[str, str]] = None) -> pd.DataFrame:
         """
         Load survey data from various sources
         
         Args:
             data: Can be one of:
                 - None: generates dummy sample data
-                - pd.DataFrame: uses it directly
+                - pd.DataFrame: uses its data without copying
                 - dict: converts to DataFrame
                 - str (file path): loads from CSV, Excel, or PDF based on extension
+            dtype: Optional column -> dtype map for CSV files (see load_from_csv)
             
         Returns:
             DataFrame with survey data
@@ -67,24 +139,73 @@ class DataLoader:
         if data is None:
             # Generate sample data
             data_dict = DataLoader.generate_sample_data()
-            return pd.DataFrame(data_dict)
+            return DataLoader.optimize_dtypes(DataLoader.to_arrow_dtypes(pd.DataFrame(data_dict)))
         elif isinstance(data, pd.DataFrame):
-            return data.copy()
+            # A shallow copy shares the column data; the dtype conversions below
+            # replace whole columns, so they never write back into the caller's frame
+            return DataLoader.optimize_dtypes(data.copy(deep=False))
         elif isinstance(data, dict):
-            return pd.DataFrame(data)
+            return DataLoader.optimize_dtypes(DataLoader.to_arrow_dtypes(pd.DataFrame(data)))
         elif isinstance(data, str):
             # It's a file path
-            return DataLoader.load_from_file(data)
+            return DataLoader.load_from_file(data, dtype=dtype)
         else:
             raise ValueError("Data must be DataFrame, dict, file path (str), or None")
     
     @staticmethod
-    def load_from_file(file_path: str) -> pd.DataFrame:
+    def to_arrow_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convert columns to pyarrow-backed dtypes when pyarrow is installed
+        
+        Args:
+            df: DataFrame with survey data
+            
+        Returns:
+            DataFrame with Arrow-backed columns, or the input unchanged
+        """
+        if not PYARROW_AVAILABLE:
+            return df
+        try:
+            return df.convert_dtypes(dtype_backend='pyarrow')
+        except (ImportError, NameError):
+            # pyarrow is installed but fails to load (e.g. built against another numpy) -
+            # keep the NumPy dtypes, as the CSV reader does
+            return df
+    
+    @staticmethod
+    def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Store known text columns as categoricals and score columns as int8
+        
+        Groupbys on categoricals work on integer codes instead of hashing
+        strings, and int8 scores cut memory traffic for reductions and charts.
+        Score columns that are not integer, or hold missing values, are left as is.
+        
+        Args:
+            df: DataFrame with survey data
+            
+        Returns:
+            The same DataFrame with converted columns
+        """
+        for col in DataLoader.CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        
+        for col in DataLoader.SCORE_COLUMNS:
+            if col in df.columns and pd.api.types.is_integer_dtype(df[col]) and not df[col].hasnans:
+                # downcast picks the smallest dtype that holds the values (int8 for survey scales)
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+        
+        return df
+    
+    @staticmethod
+    def load_from_file(file_path: str, dtype: Optional[Dict[str, str]] = None) -> pd.DataFrame:
         """
         Auto-detect file type and load accordingly
         
         Args:
             file_path: Path to CSV, Excel, or PDF file
+            dtype: Optional column -> dtype map for CSV files (see load_from_csv)
             
         Returns:
             DataFrame with loaded data
@@ -95,7 +216,7 @@ class DataLoader:
         ext = os.path.splitext(file_path)[1].lower()
         
         if ext == '.csv':
-            return DataLoader.load_from_csv(file_path)
+            return DataLoader.load_from_csv(file_path, dtype=dtype)
         elif ext in ['.xlsx', '.xls']:
             return DataLoader.load_from_excel(file_path)
         elif ext == '.pdf':
@@ -104,20 +225,32 @@ class DataLoader:
             raise ValueError(f"Unsupported file type: {ext}. Supported: .csv, .xlsx, .xls, .pdf")
     
     @staticmethod
-    def load_from_csv(file_path: str) -> pd.DataFrame:
+    def load_from_csv(file_path: str, dtype: Optional[Dict[str, str]] = None) -> pd.DataFrame:
         """
         Load data from CSV file
         
+        Uses pyarrow's multi-threaded CSV reader when pyarrow is installed,
+        otherwise the default pandas parser.
+        
         Args:
             file_path: Path to CSV file
+            dtype: Optional column -> dtype map (e.g. {'satisfaction': 'int8'})
+                to skip type inference for known columns
             
         Returns:
             DataFrame with survey data
         """
-        print(f"📂 Loading CSV: {file_path}")
-        df = pd.read_csv(file_path)
-        print(f"   ✅ Loaded {len(df)} rows, {len(df.columns)} columns")
-        print(f"   Columns: {', '.join(df.columns.tolist())}")
+        logger.info(f"📂 Loading CSV: {file_path}")
+        try:
+            df = pd.read_csv(file_path, engine='pyarrow', dtype_backend='pyarrow', dtype=dtype)
+        except (ImportError, ValueError):
+            df = pd.read_csv(file_path, dtype=dtype)
+        if 'timestamp' in df.columns:
+            # Arrow reads ISO dates as date32 (and pandas as text); the analysis expects datetimes
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = DataLoader.optimize_dtypes(df)
+        logger.info(f"   ✅ Loaded {len(df)} rows, {len(df.columns)} columns")
+        logger.info(f"   Columns: {', '.join(df.columns.tolist())}")
         return df
     
     @staticmethod
@@ -132,10 +265,10 @@ class DataLoader:
         Returns:
             DataFrame with survey data
         """
-        print(f"📂 Loading Excel: {file_path}")
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
-        print(f"   ✅ Loaded {len(df)} rows, {len(df.columns)} columns")
-        print(f"   Columns: {', '.join(df.columns.tolist())}")
+        logger.info(f"📂 Loading Excel: {file_path}")
+        df = DataLoader.optimize_dtypes(pd.read_excel(file_path, sheet_name=sheet_name))
+        logger.info(f"   ✅ Loaded {len(df)} rows, {len(df.columns)} columns")
+        logger.info(f"   Columns: {', '.join(df.columns.tolist())}")
         return df
     
     @staticmethod
@@ -157,20 +290,29 @@ class DataLoader:
                 "Install it: pip install pdfplumber"
             )
         
-        print(f"📂 Loading PDF: {file_path}")
+        logger.info(f"📂 Loading PDF: {file_path}")
         
-        all_tables = []
         with pdfplumber.open(file_path) as pdf:
-            for i, page in enumerate(pdf.pages):
-                tables = page.extract_tables()
-                for table in tables:
-                    if table and len(table) > 1:
-                        # First row as header, rest as data
-                        header = table[0]
-                        rows = table[1:]
-                        df_table = pd.DataFrame(rows, columns=header)
-                        all_tables.append(df_table)
-                        print(f"   Found table on page {i+1}: {len(rows)} rows")
+            n_pages = len(pdf.pages)
+            if n_pages <= 1:
+                # Not worth spawning worker processes for a single page
+                page_tables = [page.extract_tables() for page in pdf.pages]
+        
+        if n_pages > 1:
+            # Pages are independent and extraction is CPU-bound, so use processes
+            with ProcessPoolExecutor() as executor:
+                page_tables = list(executor.map(partial(_extract_page_tables, file_path), range(n_pages)))
+        
+        all_tables = []
+        for i, tables in enumerate(page_tables):
+            for table in tables:
+                if table and len(table) > 1:
+                    # First row as header, rest as data
+                    header = table[0]
+                    rows = table[1:]
+                    df_table = pd.DataFrame(rows, columns=header)
+                    all_tables.append(df_table)
+                    logger.info(f"   Found table on page {i+1}: {len(rows)} rows")
         
         if not all_tables:
             raise ValueError(f"No tables found in PDF: {file_path}")
@@ -181,6 +323,6 @@ class DataLoader:
         else:
             df = pd.concat(all_tables, ignore_index=True)
         
-        print(f"   ✅ Loaded {len(df)} rows, {len(df.columns)} columns")
-        print(f"   Columns: {', '.join(df.columns.tolist())}")
+        logger.info(f"   ✅ Loaded {len(df)} rows, {len(df.columns)} columns")
+        logger.info(f"   Columns: {', '.join(df.columns.tolist())}")
         return df
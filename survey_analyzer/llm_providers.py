@@ -3,18 +3,19 @@ LLM Provider for Survey Analyzer
 Uses Google Gemini Flash 2.5 API
 """
 
+import logging
+import os
+import time
+import random
+import hashlib
+import inspect
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Callable, Optional
 
 from .config import Config
 
-
-# Check if Gemini library is installed
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+logger = logging.getLogger(__name__)
 
 
 class BaseLLMProvider(ABC):
@@ -25,8 +26,15 @@ class BaseLLMProvider(ABC):
         self.available = False
     
     @abstractmethod
-    def generate(self, prompt: str) -> Optional[str]:
-        """Generate response from LLM"""
+    def generate(self, prompt: str,
+                 on_chunk: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """
+        Generate response from LLM
+        
+        Args:
+            prompt: Prompt text
+            on_chunk: Optional callback invoked with each piece of text as it arrives
+        """
         raise NotImplementedError
 
 
@@ -37,44 +45,130 @@ class GeminiProvider(BaseLLMProvider):
         super().__init__()
         self.name = "Google Gemini Flash 2.5"
         self.api_key = Config.get_gemini_api_key()
+        self.model_name = "gemini-2.0-flash"
+        self.temperature = 0.7
+        self.max_output_tokens = 2000
+        self.max_retries = 5
+        self.request_timeout = 60
         self.model = None
+        self._request_kwargs = {}
         
-        if not GEMINI_AVAILABLE:
-            print("   ❌ google-generativeai not installed. Run: pip install google-generativeai")
+        # Imported here rather than at module level - the SDK is slow to import
+        try:
+            import google.generativeai as genai
+            from google.api_core import exceptions as api_exceptions
+        except ImportError:
+            logger.error("   ❌ google-generativeai not installed. Run: pip install google-generativeai")
             self.available = False
             return
+        self._genai = genai
+        # Transient errors (rate limits, overload, timeouts) worth retrying
+        self._retryable_errors = (
+            api_exceptions.ResourceExhausted,
+            api_exceptions.ServiceUnavailable,
+            api_exceptions.DeadlineExceeded,
+        )
         
         if not self.api_key:
-            print("   ❌ Gemini API key not set. Add your key in api_key.py")
+            logger.error("   ❌ Gemini API key not set. Add your key in api_key.py")
             self.available = False
             return
         
         # Configure and initialize
         try:
             genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel("gemini-2.0-flash")
+            self.model = genai.GenerativeModel(self.model_name)
+            # Older SDK releases don't accept request_options - only pass the timeout when supported
+            if 'request_options' in inspect.signature(self.model.generate_content).parameters:
+                self._request_kwargs = {'request_options': {'timeout': self.request_timeout}}
             self.available = True
-            print("   ✅ Gemini Flash 2.5 initialized successfully")
+            logger.info("   ✅ Gemini Flash 2.5 initialized successfully")
         except Exception as e:
-            print(f"   ❌ Gemini initialization error: {e}")
+            logger.error(f"   ❌ Gemini initialization error: {e}")
             self.available = False
     
-    def generate(self, prompt: str) -> Optional[str]:
-        """Generate response from Gemini"""
+    def _cache_path(self, prompt: str) -> str:
+        """Cache file for a prompt, fingerprinted with the generation settings"""
+        key = f"{prompt}|{self.model_name}|{self.temperature}|{self.max_output_tokens}"
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(Config.LLM_CACHE_DIR, f"{digest}.txt")
+    
+    def generate(self, prompt: str, on_chunk: Optional[Callable[[str], None]] = None,
+                 force_refresh: bool = False) -> Optional[str]:
+        """
+        Generate response from Gemini
+        
+        Responses are streamed, so callers can start writing output as soon
+        as the first chunk arrives. They are also cached on disk, so
+        re-running on the same data skips the API call.
+        
+        Args:
+            prompt: Prompt text
+            on_chunk: Optional callback invoked with each chunk of text
+            force_refresh: Ignore any cached response and call the API
+            
+        Returns:
+            Response text or None on error
+        """
         if not self.available or self.model is None:
             return None
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=2000,
+        
+        cache_path = self._cache_path(prompt)
+        if not force_refresh and os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            if on_chunk:
+                on_chunk(text)
+            return text
+        
+        for attempt in range(self.max_retries):
+            buf = []
+            # Chunks reach on_chunk stripped like the returned text: leading whitespace
+            # is dropped and trailing whitespace is held back until more text follows
+            held, started = "", False
+            try:
+                response = self.model.generate_content(
+                    prompt,
+                    generation_config=self._genai.types.GenerationConfig(
+                        temperature=self.temperature,
+                        max_output_tokens=self.max_output_tokens,
+                    ),
+                    stream=True,
+                    **self._request_kwargs
                 )
-            )
-            return response.text.strip() if response.text else None
-        except Exception as e:
-            print(f"⚠️  Gemini API error: {e}")
-            return None
+                for chunk in response:
+                    if not chunk.text:
+                        continue
+                    buf.append(chunk.text)
+                    if on_chunk:
+                        text = held + chunk.text if started else chunk.text.lstrip()
+                        body = text.rstrip()
+                        held = text[len(body):]
+                        if body:
+                            on_chunk(body)
+                            started = True
+                break
+            except self._retryable_errors as e:
+                # Once text has reached on_chunk a retry would duplicate it
+                if started or attempt == self.max_retries - 1:
+                    logger.warning(f"⚠️  Gemini API error: {e}")
+                    return None
+                delay = 2 ** attempt + random.random()
+                logger.warning(f"⚠️  Gemini API busy ({type(e).__name__}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+            except Exception as e:
+                logger.warning(f"⚠️  Gemini API error: {e}")
+                return None
+        text = "".join(buf).strip() or None
+        
+        if text:
+            # Write to a temp file first so a crash never leaves a partial entry
+            os.makedirs(Config.LLM_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, cache_path)
+        return text
 
 
 def get_llm_provider() -> GeminiProvider:
@@ -90,7 +184,7 @@ def get_llm_provider() -> GeminiProvider:
     provider = GeminiProvider()
     
     if provider.available:
-        print(f"✅ Using {provider.name}")
+        logger.info(f"✅ Using {provider.name}")
         return provider
     
     # Not available - show clear instructions
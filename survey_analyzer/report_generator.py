@@ -3,69 +3,138 @@ Report generation module for Survey Analyzer
 Creates comprehensive text reports with Gemini-powered insights
 """
 
+import logging
 import os
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Optional
 
 from .config import Config
-from .statistics import StatisticsCalculator
 
+logger = logging.getLogger(__name__)
 
-class ReportGenerator:
-    """Handles generation of comprehensive text reports"""
-    
-    def __init__(self, df: pd.DataFrame, stats: Dict, llm_provider):
-        """
-        Initialize report generator
-        
-        Args:
-            df: DataFrame with survey data
-            stats: Dictionary with calculated statistics
-            llm_provider: Gemini LLM provider instance
-        """
-        self.df = df
-        self.stats = stats
-        self.llm_provider = llm_provider
-        self.stats_calc = StatisticsCalculator()
-    
-    def format_segment_table(self, segment_df: pd.DataFrame) -> str:
-        """Format segment analysis table for report"""
-        if isinstance(segment_df.columns, pd.MultiIndex):
-            means = segment_df.xs('mean', level=1, axis=1)
-        else:
-            means = segment_df
-        
-        output = []
-        cols = means.columns.tolist()
-        header = f"{'Segment':<15} " + " ".join([f"{col[:8]:>8}" for col in cols])
-        output.append(header)
-        output.append("-" * len(header))
-        
-        for idx, row in means.iterrows():
-            row_str = f"{str(idx):<15} " + " ".join([f"{val:>8.2f}" for val in row])
-            output.append(row_str)
-        
-        return "\n".join(output)
-    
-    def get_llm_insights(self, insight_type: str = "summary") -> str:
-        """Get AI-powered insights from Gemini"""
-        if not self.llm_provider.available:
-            return "[Gemini not available - check api_key.py]"
-        
-        prompts = {
-            "summary": f"""You are an expert data analyst. Analyze this survey data and provide a comprehensive executive summary.
+
+# Report layout - sections are filled with format_map from the statistics
+# dict plus a few report-only fields (see ReportGenerator.generate_report)
+_REPORT_HEADER = """
+╔═══════════════════════════════════════════════════════════════════════╗
+║                  COMPREHENSIVE SURVEY ANALYSIS REPORT                 ║
+║                     AI-POWERED INSIGHTS (GEMINI)                      ║
+╚═══════════════════════════════════════════════════════════════════════╝
+
+===========================================================================
+📊 EXECUTIVE SUMMARY
+===========================================================================
+Report Generated: {generated_at}
+LLM Provider: {provider}
+Total Responses: {total_responses:,}
+Survey Period: {date_range}
+Data Completeness: {completion_rate:.1f}%
+
+===========================================================================
+📈 KEY PERFORMANCE INDICATORS
+===========================================================================
+
+SATISFACTION METRICS:
+  Overall Satisfaction:      {avg_satisfaction:.2f} / 5.00  (σ = {std_satisfaction:.2f})
+  Product Quality:           {avg_product_quality:.2f} / 5.00  (σ = {std_product_quality:.2f})
+  Customer Service:          {avg_customer_service:.2f} / 5.00  (σ = {std_customer_service:.2f})
+  Value for Money:           {avg_value:.2f} / 5.00
+  
+  Satisfaction Distribution:
+    - 25th Percentile:       {satisfaction_p25:.1f}
+    - Median:                {satisfaction_median:.1f}
+    - 75th Percentile:       {satisfaction_p75:.1f}
+
+NET PROMOTER SCORE (NPS):
+  Overall NPS:               {nps_score:.2f}
+  Average Recommendation:    {avg_nps:.2f} / 10.00
+  
+  Breakdown:
+    • Promoters (9-10):      {promoters:>4} ({promoter_pct:.1f}%)
+    • Passives (7-8):        {passives:>4} ({passive_pct:.1f}%)
+    • Detractors (0-6):      {detractors:>4} ({detractor_pct:.1f}%)
+"""
+
+_SENTIMENT_SECTION = """
+SENTIMENT ANALYSIS:
+    • Positive Feedback:     {positive:>4} ({positive_pct:.1f}%)
+    • Neutral Feedback:      {neutral:>4} ({neutral_pct:.1f}%)
+    • Negative Feedback:     {negative:>4} ({negative_pct:.1f}%)
+"""
+
+_AGE_SECTION = """
+===========================================================================
+🎯 SEGMENT ANALYSIS
+===========================================================================
+
+PERFORMANCE BY AGE GROUP:
+{table}
+"""
+
+_REGION_SECTION = """
+PERFORMANCE BY REGION:
+{table}
+"""
+
+_REPORT_FOOTER = """
+TOP PERFORMERS:
+  Best Region:               {best_region} ({best_region_score:.2f}/5 satisfaction)
+  Best Age Group:            {top_age_group} ({top_age_score:.2f}/5 satisfaction)
+
+===========================================================================
+🤖 AI-POWERED INSIGHTS (GENERATED BY GEMINI)
+===========================================================================
+
+EXECUTIVE SUMMARY:
+{summary}
+
+TREND ANALYSIS:
+{trends}
+
+STRATEGIC RECOMMENDATIONS:
+{recommendations}
+
+===========================================================================
+📋 DATA QUALITY ASSESSMENT
+===========================================================================
+Total Data Points:         {data_points:,}
+Missing Values:            {missing_cells}
+Duplicate Responses:       {duplicates}
+Data Completeness:         {completion_rate:.2f}%
+Quality Grade:             {quality_grade}
+
+===========================================================================
+📊 STATISTICAL NOTES
+===========================================================================
+• NPS calculated as: (% Promoters - % Detractors)
+• Standard deviation (σ) indicates response variability
+• Segment analysis includes mean, std dev, and count
+• Time series based on weekly aggregations
+• Correlations calculated using Pearson method
+
+╔═══════════════════════════════════════════════════════════════════════╗
+║  Report Generated by AI Survey Analyzer v2.0                          ║
+║  Powered by Google Gemini Flash 2.5                                   ║
+╚═══════════════════════════════════════════════════════════════════════╝
+"""
+
+
+# Gemini prompts for the report insight sections, filled from the statistics dict
+_INSIGHT_PROMPTS = {
+    "summary": """You are an expert data analyst. Analyze this survey data and provide a comprehensive executive summary.
 
 SURVEY DATA:
-- Total Responses: {self.stats['total_responses']}
-- Average Satisfaction: {self.stats['avg_satisfaction']:.2f}/5.0
-- Product Quality: {self.stats['avg_product_quality']:.2f}/5.0
-- Customer Service: {self.stats['avg_customer_service']:.2f}/5.0
-- Value for Money: {self.stats['avg_value']:.2f}/5.0
-- Net Promoter Score (NPS): {self.stats['nps_score']:.2f}
-- Best Performing Region: {self.stats['best_region']} (Score: {self.stats['best_region_score']:.2f}/5.0)
-- Promoters: {self.stats['promoters']} ({self.stats['promoters']/self.stats['total_responses']*100:.1f}%)
-- Detractors: {self.stats['detractors']} ({self.stats['detractors']/self.stats['total_responses']*100:.1f}%)
+- Total Responses: {total_responses}
+- Average Satisfaction: {avg_satisfaction:.2f}/5.0
+- Product Quality: {avg_product_quality:.2f}/5.0
+- Customer Service: {avg_customer_service:.2f}/5.0
+- Value for Money: {avg_value:.2f}/5.0
+- Net Promoter Score (NPS): {nps_score:.2f}
+- Best Performing Region: {best_region} (Score: {best_region_score:.2f}/5.0)
+- Promoters: {promoters} ({promoter_pct:.1f}%)
+- Detractors: {detractors} ({detractor_pct:.1f}%)
 
 Provide a professional executive summary (4-5 sentences) that:
 1. Highlights the overall performance level
@@ -76,24 +145,24 @@ Provide a professional executive summary (4-5 sentences) that:
 
 Write in a business-professional tone suitable for executive stakeholders.""",
 
-            "trends": f"""You are a data analyst expert. Analyze these survey metrics and identify critical trends.
+    "trends": """You are a data analyst expert. Analyze these survey metrics and identify critical trends.
 
 DETAILED METRICS:
-- Overall Satisfaction: {self.stats['avg_satisfaction']:.2f}/5.0 (Std Dev: {self.stats['std_satisfaction']:.2f})
-- Product Quality: {self.stats['avg_product_quality']:.2f}/5.0 (Std Dev: {self.stats['std_product_quality']:.2f})
-- Customer Service: {self.stats['avg_customer_service']:.2f}/5.0 (Std Dev: {self.stats['std_customer_service']:.2f})
-- Value for Money: {self.stats['avg_value']:.2f}/5.0
-- Net Promoter Score: {self.stats['nps_score']:.2f}
-- Average Recommendation Score: {self.stats['avg_nps']:.2f}/10.0
+- Overall Satisfaction: {avg_satisfaction:.2f}/5.0 (Std Dev: {std_satisfaction:.2f})
+- Product Quality: {avg_product_quality:.2f}/5.0 (Std Dev: {std_product_quality:.2f})
+- Customer Service: {avg_customer_service:.2f}/5.0 (Std Dev: {std_customer_service:.2f})
+- Value for Money: {avg_value:.2f}/5.0
+- Net Promoter Score: {nps_score:.2f}
+- Average Recommendation Score: {avg_nps:.2f}/10.0
 
 SEGMENT PERFORMANCE:
-- Top Age Group: {self.stats['top_age_group']} (Satisfaction: {self.stats['top_age_score']:.2f}/5.0)
-- Top Region: {self.stats['best_region']} (Satisfaction: {self.stats['best_region_score']:.2f}/5.0)
+- Top Age Group: {top_age_group} (Satisfaction: {top_age_score:.2f}/5.0)
+- Top Region: {best_region} (Satisfaction: {best_region_score:.2f}/5.0)
 
 SATISFACTION DISTRIBUTION:
-- 25th Percentile: {self.stats['satisfaction_p25']:.1f}
-- Median: {self.stats['satisfaction_median']:.1f}
-- 75th Percentile: {self.stats['satisfaction_p75']:.1f}
+- 25th Percentile: {satisfaction_p25:.1f}
+- Median: {satisfaction_median:.1f}
+- 75th Percentile: {satisfaction_p75:.1f}
 
 Identify and explain 5-6 critical trends or patterns. For each trend:
 1. Describe what the data shows
@@ -102,19 +171,19 @@ Identify and explain 5-6 critical trends or patterns. For each trend:
 
 Format as a numbered list with clear explanations.""",
 
-            "recommendations": f"""You are a strategic business consultant. Based on this survey analysis, provide actionable recommendations.
+    "recommendations": """You are a strategic business consultant. Based on this survey analysis, provide actionable recommendations.
 
 CURRENT PERFORMANCE STATE:
-- Overall Satisfaction: {self.stats['avg_satisfaction']:.2f}/5.0
-- Net Promoter Score: {self.stats['nps_score']:.2f}
-- Promoters: {self.stats['promoters']} ({self.stats['promoters']/self.stats['total_responses']*100:.1f}%)
-- Passives: {self.stats['passives']} ({self.stats['passives']/self.stats['total_responses']*100:.1f}%)
-- Detractors: {self.stats['detractors']} ({self.stats['detractors']/self.stats['total_responses']*100:.1f}%)
+- Overall Satisfaction: {avg_satisfaction:.2f}/5.0
+- Net Promoter Score: {nps_score:.2f}
+- Promoters: {promoters} ({promoter_pct:.1f}%)
+- Passives: {passives} ({passive_pct:.1f}%)
+- Detractors: {detractors} ({detractor_pct:.1f}%)
 
 METRIC GAPS:
-- Service Gap: {abs(self.stats['avg_product_quality'] - self.stats['avg_customer_service']):.2f} points (Quality vs Service)
-- Value Perception: {self.stats['avg_value']:.2f}/5.0
-- Best Region: {self.stats['best_region']} ({self.stats['best_region_score']:.2f}/5.0)
+- Service Gap: {service_gap:.2f} points (Quality vs Service)
+- Value Perception: {avg_value:.2f}/5.0
+- Best Region: {best_region} ({best_region_score:.2f}/5.0)
 
 Provide 6-8 specific, actionable strategic recommendations organized by:
 1. IMMEDIATE ACTIONS (0-30 days) - Quick wins
@@ -127,132 +196,139 @@ For each recommendation, include:
 - Expected impact/outcome
 - Priority level
 
-Write in a professional, executive-ready format."""
-        }
+Write in a professional, executive-ready format.""",
+}
+
+
+class ReportGenerator:
+    """Handles generation of comprehensive text reports"""
+    
+    def __init__(self, df: pd.DataFrame, stats: Dict, llm_provider):
+        """
+        Initialize report generator
         
-        prompt = prompts.get(insight_type, prompts["summary"])
-        response = self.llm_provider.generate(prompt)
-        return response if response else f"[Error generating {insight_type} insights]"
+        Args:
+            df: DataFrame with survey data
+            stats: Dictionary with calculated statistics
+            llm_provider: Gemini LLM provider instance
+        """
+        self.df = df
+        self.stats = stats
+        self.llm_provider = llm_provider
     
-    def generate_report(self, save_path: Optional[str] = None, sentiment: Optional[Dict] = None,
-                       age_analysis: Optional[pd.DataFrame] = None,
-                       region_analysis: Optional[pd.DataFrame] = None) -> str:
-        """Generate comprehensive text report"""
+    def format_segment_table(self, segment_df: pd.DataFrame) -> str:
+        """Format segment analysis table for report"""
+        if isinstance(segment_df.columns, pd.MultiIndex):
+            means = segment_df.xs('mean', level=1, axis=1)
+        else:
+            means = segment_df
         
-        report = f"""
-╔═══════════════════════════════════════════════════════════════════════╗
-║                  COMPREHENSIVE SURVEY ANALYSIS REPORT                 ║
-║                     AI-POWERED INSIGHTS (GEMINI)                      ║
-╚═══════════════════════════════════════════════════════════════════════╝
-
-{'='*75}
-📊 EXECUTIVE SUMMARY
-{'='*75}
-Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-LLM Provider: {self.llm_provider.name}
-Total Responses: {self.stats['total_responses']:,}
-Survey Period: {self.stats['date_range']}
-Data Completeness: {self.stats['completion_rate']:.1f}%
-
-{'='*75}
-📈 KEY PERFORMANCE INDICATORS
-{'='*75}
-
-SATISFACTION METRICS:
-  Overall Satisfaction:      {self.stats['avg_satisfaction']:.2f} / 5.00  (σ = {self.stats['std_satisfaction']:.2f})
-  Product Quality:           {self.stats['avg_product_quality']:.2f} / 5.00  (σ = {self.stats['std_product_quality']:.2f})
-  Customer Service:          {self.stats['avg_customer_service']:.2f} / 5.00  (σ = {self.stats['std_customer_service']:.2f})
-  Value for Money:           {self.stats['avg_value']:.2f} / 5.00
-  
-  Satisfaction Distribution:
-    - 25th Percentile:       {self.stats['satisfaction_p25']:.1f}
-    - Median:                {self.stats['satisfaction_median']:.1f}
-    - 75th Percentile:       {self.stats['satisfaction_p75']:.1f}
-
-NET PROMOTER SCORE (NPS):
-  Overall NPS:               {self.stats['nps_score']:.2f}
-  Average Recommendation:    {self.stats['avg_nps']:.2f} / 10.00
-  
-  Breakdown:
-    • Promoters (9-10):      {self.stats['promoters']:>4} ({(self.stats['promoters']/self.stats['total_responses']*100):.1f}%)
-    • Passives (7-8):        {self.stats['passives']:>4} ({(self.stats['passives']/self.stats['total_responses']*100):.1f}%)
-    • Detractors (0-6):      {self.stats['detractors']:>4} ({(self.stats['detractors']/self.stats['total_responses']*100):.1f}%)
-"""
+        output = []
+        cols = means.columns.tolist()
+        header = f"{'Segment':<15} " + " ".join([f"{col[:8]:>8}" for col in cols])
+        output.append(header)
+        output.append("-" * len(header))
         
-        if sentiment:
-            report += f"""
-SENTIMENT ANALYSIS:
-    • Positive Feedback:     {sentiment['positive']:>4} ({sentiment['positive_pct']:.1f}%)
-    • Neutral Feedback:      {sentiment['neutral']:>4} ({(sentiment['neutral']/self.stats['total_responses']*100):.1f}%)
-    • Negative Feedback:     {sentiment['negative']:>4} ({(sentiment['negative']/self.stats['total_responses']*100):.1f}%)
-"""
+        # Format straight from the underlying array - iterrows builds a Series per row
+        values = means.to_numpy(dtype=float)
+        labels = means.index.astype(str)
+        output.extend(f"{label:<15} " + " ".join([f"{val:>8.2f}" for val in row])
+                      for label, row in zip(labels, values))
         
-        if age_analysis is not None and not age_analysis.empty:
-            report += f"""
-{'='*75}
-🎯 SEGMENT ANALYSIS
-{'='*75}
-
-PERFORMANCE BY AGE GROUP:
-{self.format_segment_table(age_analysis)}
-"""
+        return "\n".join(output)
+    
+    # Insight sections in the report, in order
+    INSIGHT_TYPES = ("summary", "trends", "recommendations")
+    
+    def _build_prompt(self, insight_type: str) -> str:
+        """Build the Gemini prompt for an insight type"""
+        template = _INSIGHT_PROMPTS.get(insight_type, _INSIGHT_PROMPTS["summary"])
+        service_gap = abs(self.stats['avg_product_quality'] - self.stats['avg_customer_service'])
+        return template.format_map({**self.stats, 'service_gap': service_gap})
+    
+    def _call_llm(self, prompt: str, insight_type: str) -> str:
+        """Send a prompt to Gemini (responses are cached by the provider)"""
+        response = self.llm_provider.generate(prompt)
+        return response if response else f"[Error generating {insight_type} insights]"
+    
+    def get_llm_insights(self, insight_type: str = "summary") -> str:
+        """Get AI-powered insights from Gemini"""
+        if not self.llm_provider.available:
+            return "[Gemini not available - check api_key.py]"
+        return self._call_llm(self._build_prompt(insight_type), insight_type)
+    
+    def get_all_insights(self) -> Dict[str, str]:
+        """Get all report insights, with the Gemini calls made concurrently"""
+        if not self.llm_provider.available:
+            return {t: "[Gemini not available - check api_key.py]" for t in self.INSIGHT_TYPES}
         
-        if region_analysis is not None and not region_analysis.empty:
-            report += f"""
-PERFORMANCE BY REGION:
-{self.format_segment_table(region_analysis)}
-"""
+        prompts = [self._build_prompt(t) for t in self.INSIGHT_TYPES]
+        with ThreadPoolExecutor(max_workers=len(self.INSIGHT_TYPES)) as executor:
+            responses = executor.map(self._call_llm, prompts, self.INSIGHT_TYPES)
+            return dict(zip(self.INSIGHT_TYPES, responses))
+    
+    def generate_report(self, save_path: Optional[str] = None, sentiment: Optional[Dict] = None,
+                       age_analysis: Optional[pd.DataFrame] = None,
+                       region_analysis: Optional[pd.DataFrame] = None,
+                       include_dup_check: bool = True, return_text: bool = True) -> str:
+        """
+        Generate comprehensive text report
         
-        report += f"""
-TOP PERFORMERS:
-  Best Region:               {self.stats['best_region']} ({self.stats['best_region_score']:.2f}/5 satisfaction)
-  Best Age Group:            {self.stats['top_age_group']} ({self.stats['top_age_score']:.2f}/5 satisfaction)
-"""
+        Args:
+            save_path: Path to save the report
+            sentiment: Sentiment counts from the statistics calculator
+            age_analysis: Segment analysis by age group
+            region_analysis: Segment analysis by region
+            include_dup_check: Count duplicate responses (hashes every row)
+            return_text: Return the report text; if False only the file is written
+                         and its path is returned, so the text is never held in memory
+            
+        Returns:
+            Report text, or the report path when return_text is False
+        """
+        duplicates = self.df.duplicated().sum() if include_dup_check else "Not checked"
         
-        # Gemini-powered insights
-        report += f"""
-{'='*75}
-🤖 AI-POWERED INSIGHTS (GENERATED BY GEMINI)
-{'='*75}
-
-EXECUTIVE SUMMARY:
-{self.get_llm_insights("summary")}
-
-TREND ANALYSIS:
-{self.get_llm_insights("trends")}
-
-STRATEGIC RECOMMENDATIONS:
-{self.get_llm_insights("recommendations")}
-"""
+        # Fetch the three Gemini sections in parallel - one round-trip instead of three
+        insights = self.get_all_insights()
         
-        report += f"""
-{'='*75}
-📋 DATA QUALITY ASSESSMENT
-{'='*75}
-Total Data Points:         {len(self.df) * len(self.df.columns):,}
-Missing Values:            {self.df.isnull().sum().sum()}
-Duplicate Responses:       {self.df.duplicated().sum()}
-Data Completeness:         {self.stats['completion_rate']:.2f}%
-Quality Grade:             {'A+' if self.stats['completion_rate'] > 95 else 'A' if self.stats['completion_rate'] > 90 else 'B'}
-
-{'='*75}
-📊 STATISTICAL NOTES
-{'='*75}
-• NPS calculated as: (% Promoters - % Detractors)
-• Standard deviation (σ) indicates response variability
-• Segment analysis includes mean, std dev, and count
-• Time series based on weekly aggregations
-• Correlations calculated using Pearson method
-
-╔═══════════════════════════════════════════════════════════════════════╗
-║  Report Generated by AI Survey Analyzer v2.0                          ║
-║  Powered by Google Gemini Flash 2.5                                   ║
-╚═══════════════════════════════════════════════════════════════════════╝
-"""
+        total = self.stats['total_responses']
+        completion = self.stats['completion_rate']
+        fields = {
+            **self.stats,
+            **insights,
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'provider': self.llm_provider.name,
+            'data_points': len(self.df) * len(self.df.columns),
+            'duplicates': duplicates,
+            'quality_grade': 'A+' if completion > 95 else 'A' if completion > 90 else 'B',
+        }
         
+        # Each section goes straight to the (buffered) file as it is formatted;
+        # sections are only kept when the caller wants the report text back
+        parts = []
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        with open(save_path, 'w', encoding='utf-8') as f:
-            f.write(report)
+        with open(save_path, 'w', encoding='utf-8', buffering=64 * 1024) as f:
+            def write(section: str):
+                f.write(section)
+                if return_text:
+                    parts.append(section)
+            
+            write(_REPORT_HEADER.format_map(fields))
+            
+            if sentiment:
+                write(_SENTIMENT_SECTION.format_map({
+                    **sentiment,
+                    'neutral_pct': sentiment['neutral'] / total * 100,
+                    'negative_pct': sentiment['negative'] / total * 100,
+                }))
+            
+            if age_analysis is not None and not age_analysis.empty:
+                write(_AGE_SECTION.format(table=self.format_segment_table(age_analysis)))
+            
+            if region_analysis is not None and not region_analysis.empty:
+                write(_REGION_SECTION.format(table=self.format_segment_table(region_analysis)))
+            
+            write(_REPORT_FOOTER.format_map(fields))
         
-        print(f"✅ Report saved to: {save_path}")
-        return report
+        logger.info(f"✅ Report saved to: {save_path}")
+        return "".join(parts) if return_text else save_path
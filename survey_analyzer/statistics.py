@@ -3,13 +3,120 @@ Statistical analysis module for Survey Analyzer
 Handles all statistical calculations and segment analysis
 """
 
+import numpy as np
 import pandas as pd
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# Below this many texts the pandas scan is faster once importing numba and loading
+# its compiled kernel are counted. Feedback is categorical, so this counts distinct
+# texts, not rows.
+NUMBA_MIN_TEXTS = 500_000
+
+
+def _to_byte_buffer(values: list) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack byte strings end to end into one uint8 buffer
+    
+    Args:
+        values: List of bytes objects
+        
+    Returns:
+        Tuple of (buffer, offsets) - value i is buffer[offsets[i]:offsets[i + 1]]
+    """
+    buffer = np.frombuffer(b"".join(values), dtype=np.uint8)
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, values), dtype=np.int64, count=len(values)), out=offsets[1:])
+    return buffer, offsets
+
+
+@lru_cache(maxsize=None)
+def _keyword_kernel():
+    """
+    Compile the keyword scan with numba on first use
+    
+    numba is optional and slow to import, so it is only imported once a
+    feedback column is large enough to use it.
+    
+    Returns:
+        The compiled kernel, or None if numba is not installed
+    """
+    try:
+        import numba
+    except ImportError:
+        return None
+    
+    @numba.njit(parallel=True, cache=True)
+    def keyword_labels(texts, text_offsets, keywords, keyword_offsets, n_positive):
+        """
+        Label texts 0 (neutral), 1 (positive) or 2 (negative) by keyword counts
+        
+        Args:
+            texts: UTF-8 texts packed end to end in one uint8 buffer
+            text_offsets: Start of each text in texts, plus the end of the last
+            keywords: Positive then negative keywords, packed the same way
+            keyword_offsets: Start of each keyword in keywords, plus the end of the last
+            n_positive: Number of positive keywords at the start of keywords
+        """
+        n_texts = len(text_offsets) - 1
+        labels = np.zeros(n_texts, dtype=np.int8)
+        for i in numba.prange(n_texts):
+            pos_count = 0
+            neg_count = 0
+            for k in range(len(keyword_offsets) - 1):
+                kw_start = keyword_offsets[k]
+                m = keyword_offsets[k + 1] - kw_start
+                for start in range(text_offsets[i], text_offsets[i + 1] - m + 1):
+                    j = 0
+                    while j < m and texts[start + j] == keywords[kw_start + j]:
+                        j += 1
+                    if j == m:
+                        if k < n_positive:
+                            pos_count += 1
+                        else:
+                            neg_count += 1
+                        break
+            if pos_count > neg_count:
+                labels[i] = 1
+            elif neg_count > pos_count:
+                labels[i] = 2
+        return labels
+    
+    return keyword_labels
 
 
 class StatisticsCalculator:
     """Handles statistical calculations for survey data"""
     
+    # Keyword lists for feedback sentiment
+    POSITIVE_WORDS = ['excellent', 'great', 'amazing', 'fantastic', 'love', 'perfect', 
+                      'outstanding', 'wonderful', 'satisfied', 'recommend', 'exceeded']
+    NEGATIVE_WORDS = ['poor', 'bad', 'terrible', 'disappointed', 'awful', 'horrible',
+                      'worse', 'not satisfied', 'problem', 'issue', 'complaint']
+    
+    @staticmethod
+    def nps_counts(series: pd.Series) -> Tuple[int, int, int, int]:
+        """
+        Count promoters (9-10), passives (7-8) and detractors (0-6) in one pass
+        
+        Args:
+            series: Integer recommendation scores (0-10 scale)
+            
+        Returns:
+            Tuple of (promoters, passives, detractors, total responses)
+        """
+        scores = series.dropna().to_numpy()
+        if not np.issubdtype(scores.dtype, np.integer):
+            # Fractional scores (e.g. 6.5) fall between buckets - apply the rules directly
+            scores = scores.astype(float)
+            return (int((scores >= 9).sum()), int(((scores >= 7) & (scores <= 8)).sum()),
+                    int((scores <= 6).sum()), len(series))
+        # Clip in the source dtype before narrowing, so out-of-range scores land in
+        # the end buckets (>= 9 promoter, <= 6 detractor) instead of wrapping around
+        scores = np.clip(scores, 0, 10).astype(np.int8)
+        counts = np.bincount(scores, minlength=11)
+        return int(counts[9:].sum()), int(counts[7:9].sum()), int(counts[:7].sum()), len(series)
+    
     @staticmethod
     def calculate_nps(df: pd.DataFrame, nps_column: str = 'likelihood_to_recommend') -> float:
         """
@@ -22,66 +129,125 @@ class StatisticsCalculator:
         Returns:
             NPS score as percentage
         """
-        total = len(df)
-        if total == 0:
+        if len(df) == 0:
             return 0.0
         
-        promoters = len(df[df[nps_column] >= 9])
-        detractors = len(df[df[nps_column] <= 6])
+        promoters, _, detractors, total = StatisticsCalculator.nps_counts(df[nps_column])
         return ((promoters - detractors) / total) * 100
     
     @staticmethod
-    def calculate_comprehensive_stats(df: pd.DataFrame) -> Dict:
+    def segment_means(df: pd.DataFrame) -> Dict:
+        """
+        Average scores per region and per age group
+        
+        Args:
+            df: DataFrame with survey data
+            
+        Returns:
+            Dictionary with 'region_satisfaction' (Series) and 'age_means' (DataFrame),
+            each present only when its columns exist
+        """
+        means = {}
+        if 'region' in df.columns and 'satisfaction' in df.columns:
+            # Unsorted groups are enough: the chart sorts by value and best_region sorts the labels
+            means['region_satisfaction'] = df.groupby('region', sort=False, observed=True)['satisfaction'].mean()
+        
+        age_cols = [col for col in ('satisfaction', 'product_quality', 'customer_service') if col in df.columns]
+        if 'age_group' in df.columns and age_cols:
+            # Kept sorted - the age group chart plots these in label order
+            means['age_means'] = df.groupby('age_group', observed=True)[age_cols].mean()
+        return means
+    
+    @staticmethod
+    def calculate_comprehensive_stats(df: pd.DataFrame, missing_cells: Optional[int] = None,
+                                      segment_means: Optional[Dict] = None) -> Dict:
         """
         Calculate comprehensive statistics from survey data
         
         Args:
             df: DataFrame with survey data
+            missing_cells: Missing-value count, if the caller already knows it (skips the scan)
+            segment_means: Result of segment_means(df), if the caller already has it
             
         Returns:
             Dictionary with all calculated statistics
         """
+        if 'likelihood_to_recommend' in df.columns:
+            promoters, passives, detractors, total = StatisticsCalculator.nps_counts(df['likelihood_to_recommend'])
+            nps_score = ((promoters - detractors) / total) * 100 if total else 0.0
+        else:
+            promoters = passives = detractors = total = 0
+            nps_score = 0.0
+        
+        completion_rate, missing_cells = StatisticsCalculator._calculate_completion_rate(df, missing_cells)
+        
+        # Means and standard deviations for all score columns in one reduction
+        score_cols = ['satisfaction', 'product_quality', 'customer_service',
+                      'value_for_money', 'likelihood_to_recommend']
+        present = [col for col in score_cols if col in df.columns]
+        agg = df[present].agg(['mean', 'std']) if present else pd.DataFrame()
+        
+        def agg_stat(col: str, stat: str) -> float:
+            return agg.loc[stat, col] if col in present else 0.0
+        
+        # All three cut points from one partition of the raw array
+        satisfaction = df['satisfaction'].dropna().to_numpy(dtype=float) if 'satisfaction' in df.columns else None
+        if satisfaction is not None and len(satisfaction):
+            p25, median, p75 = np.percentile(satisfaction, [25, 50, 75])
+        elif satisfaction is not None:
+            p25 = median = p75 = np.nan
+        else:
+            p25 = median = p75 = 0.0
+        
         stats = {
             # Basic info
             'total_responses': len(df),
             'date_range': f"{df['timestamp'].min().date()} to {df['timestamp'].max().date()}" if 'timestamp' in df.columns else "N/A",
-            'completion_rate': StatisticsCalculator._calculate_completion_rate(df),
+            'completion_rate': completion_rate,
+            'missing_cells': missing_cells,
             
             # Core metrics
-            'avg_satisfaction': df['satisfaction'].mean() if 'satisfaction' in df.columns else 0.0,
-            'avg_product_quality': df['product_quality'].mean() if 'product_quality' in df.columns else 0.0,
-            'avg_customer_service': df['customer_service'].mean() if 'customer_service' in df.columns else 0.0,
-            'avg_value': df['value_for_money'].mean() if 'value_for_money' in df.columns else 0.0,
-            'avg_nps': df['likelihood_to_recommend'].mean() if 'likelihood_to_recommend' in df.columns else 0.0,
+            'avg_satisfaction': agg_stat('satisfaction', 'mean'),
+            'avg_product_quality': agg_stat('product_quality', 'mean'),
+            'avg_customer_service': agg_stat('customer_service', 'mean'),
+            'avg_value': agg_stat('value_for_money', 'mean'),
+            'avg_nps': agg_stat('likelihood_to_recommend', 'mean'),
             
             # Standard deviations
-            'std_satisfaction': df['satisfaction'].std() if 'satisfaction' in df.columns else 0.0,
-            'std_product_quality': df['product_quality'].std() if 'product_quality' in df.columns else 0.0,
-            'std_customer_service': df['customer_service'].std() if 'customer_service' in df.columns else 0.0,
+            'std_satisfaction': agg_stat('satisfaction', 'std'),
+            'std_product_quality': agg_stat('product_quality', 'std'),
+            'std_customer_service': agg_stat('customer_service', 'std'),
             
             # NPS breakdown
-            'nps_score': StatisticsCalculator.calculate_nps(df),
-            'promoters': len(df[df['likelihood_to_recommend'] >= 9]) if 'likelihood_to_recommend' in df.columns else 0,
-            'passives': len(df[(df['likelihood_to_recommend'] >= 7) & (df['likelihood_to_recommend'] <= 8)]) if 'likelihood_to_recommend' in df.columns else 0,
-            'detractors': len(df[df['likelihood_to_recommend'] <= 6]) if 'likelihood_to_recommend' in df.columns else 0,
+            'nps_score': nps_score,
+            'promoters': promoters,
+            'passives': passives,
+            'detractors': detractors,
+            'promoter_pct': promoters / total * 100 if total else 0.0,
+            'passive_pct': passives / total * 100 if total else 0.0,
+            'detractor_pct': detractors / total * 100 if total else 0.0,
             
             # Percentiles
-            'satisfaction_p25': df['satisfaction'].quantile(0.25) if 'satisfaction' in df.columns else 0.0,
-            'satisfaction_median': df['satisfaction'].median() if 'satisfaction' in df.columns else 0.0,
-            'satisfaction_p75': df['satisfaction'].quantile(0.75) if 'satisfaction' in df.columns else 0.0,
+            'satisfaction_p25': p25,
+            'satisfaction_median': median,
+            'satisfaction_p75': p75,
         }
         
         # Top/bottom performers (if region and age_group columns exist)
-        if 'region' in df.columns and 'satisfaction' in df.columns:
-            region_stats = df.groupby('region')['satisfaction'].mean()
-            stats['best_region'] = region_stats.idxmax()
+        if segment_means is None:
+            segment_means = StatisticsCalculator.segment_means(df)
+        
+        if 'region_satisfaction' in segment_means:
+            region_stats = segment_means['region_satisfaction']
+            # Sorted labels so ties go to the first region by name, not by appearance in the data
+            stats['best_region'] = region_stats.sort_index().idxmax()
             stats['best_region_score'] = region_stats.max()
         else:
             stats['best_region'] = "N/A"
             stats['best_region_score'] = 0.0
         
-        if 'age_group' in df.columns and 'satisfaction' in df.columns:
-            age_stats = df.groupby('age_group')['satisfaction'].mean()
+        if 'age_means' in segment_means and 'satisfaction' in segment_means['age_means'].columns:
+            age_stats = segment_means['age_means']['satisfaction']
             stats['top_age_group'] = age_stats.idxmax()
             stats['top_age_score'] = age_stats.max()
         else:
@@ -91,13 +257,16 @@ class StatisticsCalculator:
         return stats
     
     @staticmethod
-    def _calculate_completion_rate(df: pd.DataFrame) -> float:
-        """Calculate data completion rate"""
+    def _calculate_completion_rate(df: pd.DataFrame,
+                                   missing_cells: Optional[int] = None) -> Tuple[float, int]:
+        """Calculate data completion rate and the number of missing cells"""
         if len(df) == 0:
-            return 0.0
+            return 0.0, 0
         total_cells = len(df) * len(df.columns)
-        missing_cells = df.isnull().sum().sum()
-        return 100.0 - (missing_cells / total_cells * 100) if total_cells > 0 else 100.0
+        if missing_cells is None:
+            missing_cells = int(df.isnull().sum().sum())
+        rate = 100.0 - (missing_cells / total_cells * 100) if total_cells > 0 else 100.0
+        return rate, missing_cells
     
     @staticmethod
     def analyze_by_segment(df: pd.DataFrame, segment_column: str) -> pd.DataFrame:
@@ -120,7 +289,41 @@ class StatisticsCalculator:
         if not available_cols:
             return pd.DataFrame()
         
-        return df.groupby(segment_column)[available_cols].agg(['mean', 'std', 'count']).round(2)
+        return df.groupby(segment_column, observed=True)[available_cols].agg(['mean', 'std', 'count']).round(2)
+    
+    @staticmethod
+    def _classify_sentiment(feedback: pd.Series) -> np.ndarray:
+        """
+        Label each feedback text as positive, negative or neutral
+        
+        A text is positive when it contains more positive keywords than
+        negative ones, and vice versa. Missing feedback is neutral.
+        
+        Args:
+            feedback: Series of feedback text
+            
+        Returns:
+            Array of sentiment labels, one per row
+        """
+        text = feedback.astype('string').str.lower()
+        
+        kernel = _keyword_kernel() if len(text) >= NUMBA_MIN_TEXTS else None
+        if kernel is not None:
+            # One compiled pass over the rows instead of one pandas scan per keyword
+            texts, text_offsets = _to_byte_buffer(text.fillna('').str.encode('utf-8').tolist())
+            words = StatisticsCalculator.POSITIVE_WORDS + StatisticsCalculator.NEGATIVE_WORDS
+            keywords, keyword_offsets = _to_byte_buffer([w.encode('utf-8') for w in words])
+            codes = kernel(texts, text_offsets, keywords, keyword_offsets,
+                           len(StatisticsCalculator.POSITIVE_WORDS))
+            return np.array(['neutral', 'positive', 'negative'])[codes]
+        
+        # Each keyword is one vectorized substring scan; summing the matches counts keywords present
+        pos_count = sum(text.str.contains(word, regex=False, na=False).to_numpy(dtype=np.int8)
+                        for word in StatisticsCalculator.POSITIVE_WORDS)
+        neg_count = sum(text.str.contains(word, regex=False, na=False).to_numpy(dtype=np.int8)
+                        for word in StatisticsCalculator.NEGATIVE_WORDS)
+        return np.select([pos_count > neg_count, neg_count > pos_count],
+                         ['positive', 'negative'], default='neutral')
     
     @staticmethod
     def get_sentiment_analysis(df: pd.DataFrame) -> Optional[Dict]:
@@ -136,28 +339,16 @@ class StatisticsCalculator:
         if 'feedback' not in df.columns:
             return None
         
-        positive_words = ['excellent', 'great', 'amazing', 'fantastic', 'love', 'perfect', 
-                         'outstanding', 'wonderful', 'satisfied', 'recommend', 'exceeded']
-        negative_words = ['poor', 'bad', 'terrible', 'disappointed', 'awful', 'horrible',
-                         'worse', 'not satisfied', 'problem', 'issue', 'complaint']
-        
-        def classify_sentiment(text):
-            if pd.isna(text):
-                return 'neutral'
-            text_lower = str(text).lower()
-            pos_count = sum(word in text_lower for word in positive_words)
-            neg_count = sum(word in text_lower for word in negative_words)
-            
-            if pos_count > neg_count:
-                return 'positive'
-            elif neg_count > pos_count:
-                return 'negative'
-            else:
-                return 'neutral'
-        
-        df_copy = df.copy()
-        df_copy['sentiment'] = df_copy['feedback'].apply(classify_sentiment)
-        sentiment_counts = df_copy['sentiment'].value_counts()
+        feedback = df['feedback']
+        if isinstance(feedback.dtype, pd.CategoricalDtype):
+            # Classify each distinct text once and map the labels back through the codes;
+            # missing feedback has code -1, which picks the trailing 'neutral'
+            category_labels = StatisticsCalculator._classify_sentiment(feedback.cat.categories.to_series())
+            labels = np.append(category_labels, 'neutral')[feedback.cat.codes.to_numpy()]
+        else:
+            labels = StatisticsCalculator._classify_sentiment(feedback)
+        values, counts = np.unique(labels, return_counts=True)
+        sentiment_counts = dict(zip(values.tolist(), counts.tolist()))
         
         return {
             'positive': sentiment_counts.get('positive', 0),
@@ -165,3 +356,13 @@ class StatisticsCalculator:
             'negative': sentiment_counts.get('negative', 0),
             'positive_pct': (sentiment_counts.get('positive', 0) / len(df)) * 100
         }
+
+
+# The calculator holds no state, so callers use these directly rather than
+# instantiating the class
+calculate_nps = StatisticsCalculator.calculate_nps
+nps_counts = StatisticsCalculator.nps_counts
+calculate_comprehensive_stats = StatisticsCalculator.calculate_comprehensive_stats
+segment_means = StatisticsCalculator.segment_means
+analyze_by_segment = StatisticsCalculator.analyze_by_segment
+get_sentiment_analysis = StatisticsCalculator.get_sentiment_analysis
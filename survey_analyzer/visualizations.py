@@ -3,55 +3,124 @@ Visualization module for Survey Analyzer
 Creates comprehensive dashboard with multiple charts
 """
 
+import logging
 import os
+import threading
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional
 
 from .config import Config
-from .statistics import StatisticsCalculator
+from .statistics import calculate_nps, nps_counts
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+logger = logging.getLogger(__name__)
 
 
 class VisualizationGenerator:
     """Handles creation of visualization dashboards"""
     
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, stats: Optional[Dict] = None,
+                 segment_means: Optional[Dict] = None):
         """
         Initialize visualization generator
         
         Args:
             df: DataFrame with survey data
+            stats: Optional statistics dict - its NPS buckets are reused instead of recounted
+            segment_means: Optional result of segment_means(df) - reused instead of recomputed
+        """
+        self.set_data(df, stats, segment_means)
+        
+        # Dashboard figure and axes, built on the first render and reused after
+        self._fig = None
+        self._axes = None
+        self._cbar_ax = None
+        self._render_lock = threading.Lock()
+    
+    def set_data(self, df: pd.DataFrame, stats: Optional[Dict] = None,
+                 segment_means: Optional[Dict] = None):
+        """
+        Replace the data to plot (the dashboard layout is kept)
+        
+        Args:
+            df: DataFrame with survey data
+            stats: Optional statistics dict - its NPS buckets are reused instead of recounted
+            segment_means: Optional result of segment_means(df) - reused instead of recomputed
         """
+        # The weekly trend chart resamples on timestamp; sort once up front
+        if 'timestamp' in df.columns and not df['timestamp'].is_monotonic_increasing:
+            df = df.sort_values('timestamp')
         self.df = df
-        self.stats_calc = StatisticsCalculator()
+        self.stats = stats or {}
+        self.segment_means = segment_means or {}
+    
+    def _build_layout(self):
+        """Create the dashboard figure, its title and the eight chart axes"""
+        from matplotlib.figure import Figure
+        
+        # A standalone Figure (not pyplot-managed) so it can be kept between renders
+        fig = Figure(figsize=Config.FIGURE_SIZE)
+        gs = fig.add_gridspec(3, 3, hspace=0.3, wspace=0.3)
+        
+        # Main title
+        fig.suptitle('Survey Analysis Dashboard', fontsize=20, fontweight='bold', y=0.98)
+        
+        axes = [fig.add_subplot(gs[0, 0]), fig.add_subplot(gs[0, 1]), fig.add_subplot(gs[0, 2]),
+                fig.add_subplot(gs[1, 0]), fig.add_subplot(gs[1, 1]), fig.add_subplot(gs[1, 2]),
+                fig.add_subplot(gs[2, :2]), fig.add_subplot(gs[2, 2])]
+        return fig, axes
     
-    def create_dashboard(self, save_path: Optional[str] = None) -> plt.Figure:
+    def create_dashboard(self, save_path: Optional[str] = None) -> "Figure":
         """
         Create comprehensive visualization dashboard
         
+        The figure and its axes are built on the first call; later calls
+        clear the axes and redraw the charts on them.
+        
         Args:
             save_path: Optional custom path to save visualization
             
         Returns:
-            Matplotlib figure object
+            Matplotlib figure object (reused by the next call)
         """
+        with self._render_lock:
+            return self._render_dashboard(save_path)
+    
+    def _render_dashboard(self, save_path: Optional[str]) -> "Figure":
+        """Draw all charts onto the (possibly reused) dashboard figure and save it"""
+        # Plotting libraries are imported on first use - they are slow to load and
+        # the statistics, report and export never need them. The dashboard is a
+        # standalone Figure saved straight to file, so the caller's pyplot backend
+        # is left alone.
+        import matplotlib
+        from matplotlib.artist import setp
+        import seaborn as sns
+        
         save_path = save_path or Config.get_visualization_path()
         
         # Set style
         sns.set_style("whitegrid")
-        plt.rcParams['figure.facecolor'] = 'white'
-        
-        fig = plt.figure(figsize=Config.FIGURE_SIZE)
-        gs = fig.add_gridspec(3, 3, hspace=0.3, wspace=0.3)
+        matplotlib.rcParams['figure.facecolor'] = 'white'
         
-        # Main title
-        fig.suptitle('Survey Analysis Dashboard', fontsize=20, fontweight='bold', y=0.98)
+        if self._fig is None:
+            self._fig, self._axes = self._build_layout()
+        else:
+            for ax in self._axes:
+                ax.clear()
+            if self._cbar_ax is not None:
+                self._cbar_ax.clear()
+                self._cbar_ax.set_visible(False)
+        fig = self._fig
+        ax1, ax2, ax3, ax4, ax5, ax6, ax7, ax8 = self._axes
         
         # 1. Satisfaction Distribution
-        ax1 = fig.add_subplot(gs[0, 0])
         if 'satisfaction' in self.df.columns:
-            self.df['satisfaction'].hist(bins=5, ax=ax1, color='#4ECDC4', edgecolor='black', alpha=0.7)
+            # Axes.hist directly - Series.hist would create a stray pyplot figure
+            ax1.hist(self.df['satisfaction'].dropna().to_numpy(), bins=5, color='#4ECDC4', edgecolor='black', alpha=0.7)
+            ax1.grid(True)
             ax1.set_title('Overall Satisfaction Distribution', fontweight='bold', fontsize=11)
             ax1.set_xlabel('Score (1-5)')
             ax1.set_ylabel('Frequency')
@@ -60,7 +129,6 @@ class VisualizationGenerator:
             ax1.legend()
         
         # 2. Metrics Comparison
-        ax2 = fig.add_subplot(gs[0, 1])
         metrics = ['satisfaction', 'product_quality', 'customer_service', 'value_for_money']
         metric_labels = ['Satisfaction', 'Quality', 'Service', 'Value']
         available_metrics = [(m, ml) for m, ml in zip(metrics, metric_labels) if m in self.df.columns]
@@ -79,52 +147,71 @@ class VisualizationGenerator:
                         f'{width:.2f}', ha='left', va='center', fontweight='bold')
         
         # 3. NPS Distribution
-        ax3 = fig.add_subplot(gs[0, 2])
         if 'likelihood_to_recommend' in self.df.columns:
-            nps_categories = pd.cut(self.df['likelihood_to_recommend'], 
-                                   bins=[0, 6, 8, 10], 
-                                   labels=['Detractors\n(0-6)', 'Passives\n(7-8)', 'Promoters\n(9-10)'])
-            nps_counts = nps_categories.value_counts()
+            # Reuse the NPS buckets counted with the statistics when available
+            if 'nps_score' in self.stats:
+                promoters, passives, detractors = (self.stats['promoters'], self.stats['passives'],
+                                                   self.stats['detractors'])
+                nps_score = self.stats['nps_score']
+            else:
+                promoters, passives, detractors, _ = nps_counts(self.df['likelihood_to_recommend'])
+                nps_score = calculate_nps(self.df)
+            nps_sizes = [detractors, passives, promoters]
+            nps_labels = ['Detractors\n(0-6)', 'Passives\n(7-8)', 'Promoters\n(9-10)']
             colors_pie = ['#FF6B6B', '#FFA07A', '#90EE90']
-            wedges, texts, autotexts = ax3.pie(nps_counts, labels=nps_counts.index, autopct='%1.1f%%',
+            wedges, texts, autotexts = ax3.pie(nps_sizes, labels=nps_labels, autopct='%1.1f%%',
                                                 colors=colors_pie, startangle=90)
             for autotext in autotexts:
                 autotext.set_color('white')
                 autotext.set_fontweight('bold')
-            nps_score = self.stats_calc.calculate_nps(self.df)
             ax3.set_title(f'NPS Distribution (Score: {nps_score:.1f})', 
                          fontweight='bold', fontsize=11)
         
         # 4. Regional Analysis
-        ax4 = fig.add_subplot(gs[1, 0])
         if 'region' in self.df.columns and 'satisfaction' in self.df.columns:
-            regional = self.df.groupby('region')['satisfaction'].mean().sort_values(ascending=True)
-            regional.plot(kind='barh', ax=ax4, color='coral')
+            regional = self.segment_means.get('region_satisfaction')
+            if regional is None:
+                regional = self.df.groupby('region', observed=True)['satisfaction'].mean()
+            regional = regional.sort_values(ascending=True)
+            # Axes methods directly - DataFrame.plot would resolve the pyplot (GUI) backend
+            positions = np.arange(len(regional))
+            ax4.barh(positions, regional.to_numpy(), height=0.5, color='coral')
+            ax4.set_yticks(positions)
+            ax4.set_yticklabels(regional.index.astype(str))
+            ax4.set_ylabel(regional.index.name or '')
             ax4.set_title('Satisfaction by Region', fontweight='bold', fontsize=11)
             ax4.set_xlabel('Average Satisfaction')
             for i, v in enumerate(regional):
                 ax4.text(v, i, f' {v:.2f}', va='center', fontweight='bold')
         
         # 5. Age Group Analysis
-        ax5 = fig.add_subplot(gs[1, 1])
         if 'age_group' in self.df.columns:
             age_cols = ['satisfaction', 'product_quality', 'customer_service']
             available_age_cols = [col for col in age_cols if col in self.df.columns]
             if available_age_cols:
-                age_data = self.df.groupby('age_group')[available_age_cols].mean()
-                age_data.plot(kind='bar', ax=ax5, width=0.8)
+                age_data = self.segment_means.get('age_means')
+                if age_data is None:
+                    age_data = self.df.groupby('age_group', observed=True)[available_age_cols].mean()
+                # One group of side-by-side bars per age group, 0.8 wide in total
+                positions = np.arange(len(age_data))
+                bar_width = 0.8 / len(age_data.columns)
+                for i, col in enumerate(age_data.columns):
+                    offset = (i - (len(age_data.columns) - 1) / 2) * bar_width
+                    ax5.bar(positions + offset, age_data[col].to_numpy(), width=bar_width)
+                ax5.set_xticks(positions)
+                ax5.set_xticklabels(age_data.index.astype(str))
                 ax5.set_title('Metrics by Age Group', fontweight='bold', fontsize=11)
                 ax5.set_xlabel('Age Group')
                 ax5.set_ylabel('Average Score')
                 ax5.legend(available_age_cols, loc='lower right')
                 ax5.tick_params(axis='x', rotation=45)
-                plt.setp(ax5.xaxis.get_majorticklabels(), rotation=45, ha='right')
+                setp(ax5.xaxis.get_majorticklabels(), rotation=45, ha='right')
         
         # 6. Recommendation Score Distribution
-        ax6 = fig.add_subplot(gs[1, 2])
         if 'likelihood_to_recommend' in self.df.columns:
-            self.df['likelihood_to_recommend'].hist(bins=11, ax=ax6, color='#96CEB4', 
-                                                    edgecolor='black', alpha=0.7)
+            ax6.hist(self.df['likelihood_to_recommend'].dropna().to_numpy(), bins=11, color='#96CEB4',
+                     edgecolor='black', alpha=0.7)
+            ax6.grid(True)
             ax6.set_title('Likelihood to Recommend', fontweight='bold', fontsize=11)
             ax6.set_xlabel('Score (0-10)')
             ax6.set_ylabel('Frequency')
@@ -133,9 +220,9 @@ class VisualizationGenerator:
             ax6.legend()
         
         # 7. Time Series Analysis
-        ax7 = fig.add_subplot(gs[2, :2])
         if 'timestamp' in self.df.columns and 'satisfaction' in self.df.columns:
-            time_series = self.df.set_index('timestamp').resample('W')['satisfaction'].mean()
+            time_series = (self.df[['timestamp', 'satisfaction']].set_index('timestamp')['satisfaction']
+                           .resample('W').mean())
             ax7.plot(time_series.index, time_series.values, marker='o', color='#4ECDC4', linewidth=2)
             ax7.fill_between(time_series.index, time_series.values, alpha=0.3, color='#4ECDC4')
             ax7.set_title('Satisfaction Trend Over Time (Weekly Average)', fontweight='bold', fontsize=11)
@@ -143,23 +230,29 @@ class VisualizationGenerator:
             ax7.set_ylabel('Average Satisfaction')
             ax7.grid(True, alpha=0.3)
             ax7.tick_params(axis='x', rotation=45)
-            plt.setp(ax7.xaxis.get_majorticklabels(), rotation=45, ha='right')
+            setp(ax7.xaxis.get_majorticklabels(), rotation=45, ha='right')
         
         # 8. Correlation Heatmap
-        ax8 = fig.add_subplot(gs[2, 2])
         corr_cols = ['satisfaction', 'product_quality', 'customer_service', 'value_for_money']
         available_corr_cols = [col for col in corr_cols if col in self.df.columns]
         if len(available_corr_cols) > 1:
             correlation = self.df[available_corr_cols].corr()
-            sns.heatmap(correlation, annot=True, fmt='.2f', cmap='coolwarm', center=0,
-                       square=True, ax=ax8, cbar_kws={"shrink": 0.8})
+            if self._cbar_ax is None:
+                sns.heatmap(correlation, annot=True, fmt='.2f', cmap='coolwarm', center=0,
+                           square=True, ax=ax8, cbar_kws={"shrink": 0.8})
+                self._cbar_ax = ax8.collections[0].colorbar.ax
+            else:
+                # Draw into the colorbar axes from the first render instead of carving out another
+                self._cbar_ax.set_visible(True)
+                sns.heatmap(correlation, annot=True, fmt='.2f', cmap='coolwarm', center=0,
+                           square=True, ax=ax8, cbar_ax=self._cbar_ax)
             ax8.set_title('Metric Correlations', fontweight='bold', fontsize=11)
         
-        plt.tight_layout()
-        
-        # Save
+        # Save - the gridspec already fixes the layout, so no tight_layout pass
+        # (the tight bbox stays: the rotated heatmap labels overhang the figure).
+        # The figure is not registered with pyplot, so there is nothing to close.
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        plt.savefig(save_path, dpi=Config.DPI, bbox_inches='tight')
-        print(f"✅ Visualizations saved to: {save_path}")
+        fig.savefig(save_path, dpi=Config.DPI, bbox_inches='tight')
+        logger.info(f"✅ Visualizations saved to: {save_path}")
         
         return fig